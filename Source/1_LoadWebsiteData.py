@@ -1,17 +1,37 @@
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import CharacterTextSplitter
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 import os
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 import time
+import queue
 import tempfile
-import PyPDF2
+from collections import Counter, deque
+import numpy as np
 from langchain.schema import Document
-import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from crawler import PoliteFetcher, CrawlFrontier, canonicalize_url, discover_sitemap_urls, CRAWL_CONCURRENCY, DEFAULT_CRAWL_DELAY
+from page_parser import parse_page
+from boilerplate import BoilerplateFilter, BOILERPLATE_SAMPLE_PAGES
+from chunk_dedup import ChunkDeduplicator
+from structure_chunker import StructureChunker, CHUNK_TARGET_TOKENS, CHUNK_MAX_TOKENS
+from ingest_pipeline import Pipeline, PipelineStopped
+from http_cache import HttpCache, HTTP_CACHE_DIR
+from embedding_cache import CachedEmbeddings
+from embedding_throttle import AdaptiveLimiter, embed_with_backoff, EMBEDDING_CONCURRENCY
+from pdf_extraction import PdfExtractionPool, PDF_EXTRACTOR
+from run_checkpoint import RunCheckpoint, CRAWL_CHECKPOINT_EVERY, EMBED_CHECKPOINT_EVERY
+from ann_index import (
+    INDEX_TYPE, QUANTIZATION, RERANK_FACTOR, convert_index, apply_search_params,
+    bytes_per_vector, measure_recall, save_rerank_vectors
+)
+from matryoshka import EMBEDDING_DIMENSIONS, truncated_embeddings
+from index_storage import save_index
+from index_versions import INDEX_ROOT, current_index_path, new_version_name, version_path, publish_version
+from index_store import (
+    load_existing_index, load_manifest, IncrementalPlanner, IndexWriter,
+    assign_chunk_ids, save_manifest
+)
 
 load_dotenv(dotenv_path="Environment/API-Key.env")
 
@@ -65,522 +85,952 @@ base_url = westlake_url (for Westlake High School)
 # PDF Processing Configuration
 PDF_SIZE_LIMIT = 15 * 1024 * 1024  # 15MB per PDF (increased to handle largest file)
 TOTAL_PDF_LIMIT = 100 * 1024 * 1024  # 100MB total across all PDFs (increased for comprehensive processing)
-MAX_PAGES_PER_PDF = 100  # Maximum pages to process per PDF
-PDF_CHUNK_SIZE = 1000  # Characters per chunk for PDF content
 MAX_PDFS_TO_PROCESS = 100  # Process all PDFs found (was 10)
+PDF_DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read per chunk while streaming a PDF to disk
 
-def find_pdf_links(base_url, all_urls):
+# Pipeline Configuration - queue sizes bound how much work is held in memory between stages
+PAGE_QUEUE_SIZE = 32  # Parsed pages waiting for template removal
+PDF_LINK_QUEUE_SIZE = 64  # PDF links waiting for the PDF stage
+DOCUMENT_QUEUE_SIZE = 16  # Sources (one web page, or every page of one PDF) waiting to be chunked
+CHUNK_QUEUE_SIZE = 500  # Chunks waiting to be embedded
+EMBEDDED_QUEUE_SIZE = 4  # Embedded batches waiting to be added to the index
+EMBEDDING_BATCH_SIZE = 256  # Chunks per embedding API call - several are in flight at once
+
+def spool_pdf_response(pdf_url, response, cache=None, max_size=PDF_SIZE_LIMIT):
     """
-    Find all PDF links from the scraped website pages
+    Stream a PDF response body to disk in chunks, aborting as soon as it exceeds max_size.
+    Returns (pdf_path, is_temp_file), or None if the PDF is too large.
     """
-    pdf_links = set()
+    filename = os.path.basename(pdf_url)
     
-    print(f"\n🔍 Searching for PDF links across {len(all_urls)} pages...")
+    # Reject early when the server tells us the size - but don't trust it
+    content_length = response.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        print(f"   ❌ {filename}: PDF too large: {int(content_length)/(1024*1024):.1f}MB (limit: {max_size/(1024*1024):.1f}MB)")
+        return None
     
-    for i, url in enumerate(all_urls, 1):
+    spool_dir = cache.cache_dir if cache else None
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=spool_dir, delete=False, suffix='.pdf.part') as spool:
         try:
-            print(f"📄 Scanning page {i}/{len(all_urls)}: {url}")
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all links that point to PDFs
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                full_url = urljoin(url, href)
+            for chunk in response.iter_content(chunk_size=PDF_DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    break
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    
+    if size > max_size:
+        print(f"   ❌ {filename}: PDF too large: over {max_size/(1024*1024):.1f}MB - download aborted")
+        os.unlink(spool.name)
+        return None
+    
+    # Keep the body in the HTTP cache when the server gave us validators
+    if cache and cache.store_file(pdf_url, response, spool.name, size):
+        return cache.body_path(pdf_url), False
+    return spool.name, True
+
+def download_pdf(pdf_url, fetcher, cache=None, max_size=PDF_SIZE_LIMIT):
+    """
+    Download a PDF with retry logic, revalidating against the HTTP cache when possible.
+    The body is streamed straight to disk - no HEAD request and no in-memory copy.
+    Returns (pdf_path, is_temp_file, not_modified), or None if the PDF is too large.
+    """
+    headers = cache.conditional_headers(pdf_url) if cache else {}
+    
+    max_retries = 2
+    for attempt in range(max_retries):
+        try:
+            response = fetcher.get(pdf_url, timeout=60, headers=headers, stream=True)  # Increased to 60 seconds
+            with response:
+                if response.status_code == 304:
+                    entry, _ = cache.revalidated(pdf_url, response, load_body=False)
+                    if entry is not None:
+                        return cache.body_path(pdf_url), False, True
+                    # Cached body went missing - download it again
+                    headers = {}
+                    continue
                 
-                # Check if it's a PDF link
-                if full_url.lower().endswith('.pdf'):
-                    pdf_links.add(full_url)
-                    print(f"   📄 Found PDF: {full_url}")
-            
-            # Also search for PDF links in text content using regex
-            text_content = soup.get_text()
-            pdf_pattern = r'https?://[^\s<>"]+\.pdf'
-            regex_pdfs = re.findall(pdf_pattern, text_content, re.IGNORECASE)
-            
-            for pdf_url in regex_pdfs:
-                full_pdf_url = urljoin(url, pdf_url)
-                if urlparse(full_pdf_url).netloc == urlparse(base_url).netloc:
-                    pdf_links.add(full_pdf_url)
-                    print(f"   📄 Found PDF (regex): {full_pdf_url}")
-            
-            time.sleep(2.5)  # Be respectful - increased delay between web page scraping
+                response.raise_for_status()
+                spooled = spool_pdf_response(pdf_url, response, cache, max_size)
+                if spooled is None:
+                    return None
+                pdf_path, is_temp_file = spooled
+                return pdf_path, is_temp_file, False
             
-        except Exception as e:
-            print(f"   ⚠️ Error scanning {url}: {e}")
-            continue
+        except requests.exceptions.Timeout:
+            if attempt < max_retries - 1:
+                print(f"   ⚠️ Timeout on attempt {attempt + 1} for {os.path.basename(pdf_url)}, retrying...")
+                time.sleep(2)
+                continue
+            else:
+                raise
     
-    print(f"\n✅ Found {len(pdf_links)} unique PDF files")
-    return list(pdf_links)
+    raise requests.exceptions.RequestException(f"Could not download {pdf_url}")
 
-def download_and_process_pdf(pdf_url, max_size=PDF_SIZE_LIMIT):
+def pdf_pages_artifact(extractor=PDF_EXTRACTOR):
+    """Cache artifact name for extracted PDF text - switching backends extracts again"""
+    return f"pdf_pages_{extractor}"
+
+def fetch_pdf_for_extraction(pdf_url, fetcher, cache=None, max_size=PDF_SIZE_LIMIT):
     """
-    Download and extract text from a PDF file with detailed logging
+    Download stage for one PDF (runs in a download thread).
+    Returns ('cached', [page Documents]) when last run's extracted text can be reused,
+    ('downloaded', (pdf_path, is_temp_file)) when the PDF still needs text extraction,
+    or ('failed', None).
     """
     filename = os.path.basename(pdf_url)
     
     try:
-        print(f"   🔄 Step 1: Checking PDF size...")
-        
-        # Check PDF size before downloading
-        head_response = requests.head(pdf_url, timeout=30)
-        content_length = head_response.headers.get('content-length')
+        downloaded = download_pdf(pdf_url, fetcher, cache, max_size)
+        if downloaded is None:
+            return 'failed', None
+        pdf_path, is_temp_file, not_modified = downloaded
         
-        if content_length:
-            size_mb = int(content_length) / (1024 * 1024)
-            if int(content_length) > max_size:
-                print(f"   ❌ PDF too large: {size_mb:.1f}MB (limit: {max_size/(1024*1024):.1f}MB)")
-                return None
-            print(f"   ✅ Size check passed: {size_mb:.1f}MB")
+        if not_modified:
+            # Unchanged since the last run - reuse the text we extracted then
+            cached_pages = cache.load_artifact(pdf_url, pdf_pages_artifact())
+            if cached_pages is not None:
+                print(f"   ♻️ {filename}: Not modified since last run - skipping text extraction")
+                return 'cached', [Document(page_content=page['page_content'], metadata=page['metadata']) for page in cached_pages]
+            print(f"   ♻️ {filename}: Not modified - reusing cached copy: {os.path.getsize(pdf_path)/1024:.1f}KB")
         else:
-            print(f"   ⚠️ Could not determine PDF size, proceeding with download...")
-        
-        print(f"   🔄 Step 2: Downloading PDF...")
-        # Download the PDF with longer timeout and retry logic
-        max_retries = 2
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(pdf_url, timeout=60)  # Increased to 60 seconds
-                response.raise_for_status()
-                break
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    print(f"   ⚠️ Timeout on attempt {attempt + 1}, retrying...")
-                    time.sleep(2)
-                    continue
-                else:
-                    raise
-        print(f"   ✅ Download completed: {len(response.content)/1024:.1f}KB")
+            print(f"   ✅ {filename}: Download completed: {os.path.getsize(pdf_path)/1024:.1f}KB")
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
-        
-        try:
-            print(f"   🔄 Step 3: Opening PDF and checking structure...")
-            # Extract text from PDF
-            with open(temp_file_path, 'rb') as pdf_file:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                
-                # Check number of pages
-                num_pages = len(pdf_reader.pages)
-                if num_pages > MAX_PAGES_PER_PDF:
-                    print(f"   ❌ PDF has too many pages: {num_pages} (limit: {MAX_PAGES_PER_PDF})")
-                    return None
-                
-                print(f"   ✅ PDF structure valid: {num_pages} pages")
-                print(f"   🔄 Step 4: Extracting text from {num_pages} pages...")
-                
-                # Extract text from all pages
-                full_text = ""
-                pages_processed = 0
-                pages_with_text = 0
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text.strip():  # Only add non-empty pages
-                            full_text += f"\n\n--- Page {page_num} ---\n{page_text}"
-                            pages_processed += 1
-                            pages_with_text += 1
-                            
-                            # Show progress for larger PDFs
-                            if num_pages > 5 and page_num % 5 == 0:
-                                print(f"      📄 Processed {page_num}/{num_pages} pages...")
-                        
-                        # Stop if we hit the page limit
-                        if page_num >= MAX_PAGES_PER_PDF:
-                            break
-                            
-                    except Exception as e:
-                        print(f"      ⚠️ Error processing page {page_num}: {e}")
-                        continue
-                
-                if full_text.strip():
-                    print(f"   ✅ Step 5: Text extraction completed!")
-                    print(f"      📊 Pages with text: {pages_with_text}/{num_pages}")
-                    print(f"      📊 Total characters: {len(full_text):,}")
-                    print(f"      📊 Average chars per page: {len(full_text)//pages_with_text if pages_with_text > 0 else 0}")
-                    
-                    # Create document with metadata
-                    doc = Document(
-                        page_content=full_text,
-                        metadata={
-                            'source': pdf_url,
-                            'filename': filename,
-                            'type': 'pdf',
-                            'pages': pages_processed,
-                            'characters': len(full_text),
-                            'total_pages': num_pages,
-                            'pages_with_text': pages_with_text
-                        }
-                    )
-                    return doc
-                else:
-                    print(f"   ❌ No readable text found in PDF")
-                    print(f"      This might be a scanned/image-based PDF")
-                    return None
-                    
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-                print(f"   🧹 Temporary file cleaned up")
-            except:
-                pass
+        # The extraction process memory-maps the spooled file directly
+        return 'downloaded', (pdf_path, is_temp_file)
                 
     except requests.exceptions.Timeout:
         print(f"   ❌ Download timeout for {filename}")
-        return None
+        return 'failed', None
     except requests.exceptions.RequestException as e:
         print(f"   ❌ Download error for {filename}: {e}")
-        return None
+        return 'failed', None
     except Exception as e:
-        print(f"   ❌ Unexpected error processing {filename}: {e}")
-        return None
+        print(f"   ❌ Unexpected error downloading {filename}: {e}")
+        return 'failed', None
 
-def process_all_pdfs(pdf_links, max_pdfs_limit=MAX_PDFS_TO_PROCESS):
+def build_pdf_page_document(pdf_url, page_number, total_pages, text):
     """
-    Process found PDF files with comprehensive limits and detailed logging
+    Create the Document for one PDF page as soon as its text arrives from the extractor
     """
-    if not pdf_links:
-        print("📄 No PDF files found to process")
-        return []
+    return Document(
+        page_content=text,
+        metadata={
+            'source': pdf_url,
+            'filename': os.path.basename(pdf_url),
+            'type': 'pdf',
+            'page': page_number,
+            'total_pages': total_pages,
+            'characters': len(text)
+        }
+    )
+
+def finish_pdf(pdf_url, page_documents, cache=None):
+    """
+    Report on a fully extracted PDF and remember its pages for the next run
+    """
+    filename = os.path.basename(pdf_url)
     
-    # Limit the number of PDFs to process
-    pdfs_to_process = pdf_links[:max_pdfs_limit]
+    if page_documents:
+        total_pages = page_documents[0].metadata['total_pages']
+        total_chars = sum(len(doc.page_content) for doc in page_documents)
+        print(f"   ✅ {filename}: Text extraction completed!")
+        print(f"      📊 Pages with text: {len(page_documents)}/{total_pages}")
+        print(f"      📊 Total characters: {total_chars:,}")
+        print(f"      📊 Average chars per page: {total_chars // len(page_documents)}")
+    else:
+        print(f"   ❌ {filename}: No readable text found in PDF")
+        print(f"      This might be a scanned/image-based PDF")
     
-    print(f"\n📚 Found {len(pdf_links)} PDF files, processing first {len(pdfs_to_process)}...")
+    if cache:
+        cache.store_artifact(pdf_url, pdf_pages_artifact(), [
+            {'page_content': doc.page_content, 'metadata': doc.metadata} for doc in page_documents
+        ])
+    return page_documents
+
+def process_pdf_stream(pdf_link_queue, document_queue, max_pdfs_limit=MAX_PDFS_TO_PROCESS, cache=None, fetcher=None, stats=None):
+    """
+    PDF stage of the pipeline - process PDF links as the crawl discovers them.
+    Downloads run in threads (rate limited per host) and feed a pool of extraction processes,
+    which stream back one Document per page - PDFs of any length are processed in full.
+    A PDF's pages are collected until it is finished, so memory is bounded per PDF, not per page.
+    Finished PDFs are passed on as (pdf_url, page Documents) in the order the crawl found
+    their links, so the total size limit and duplicate removal pick the same PDFs every run.
+    """
+    fetcher = fetcher or PoliteFetcher()
+    stats = stats if stats is not None else Counter()
+    extraction_pool = PdfExtractionPool()
+    
+    print(f"\n📚 PDF processing started ({fetcher.concurrency} download threads, {extraction_pool.max_workers} {extraction_pool.extractor} extraction processes)")
     print(f"🛡️ Safety limits:")
     print(f"   📊 Max PDFs to process: {max_pdfs_limit}")
     print(f"   📊 Max size per PDF: {PDF_SIZE_LIMIT/(1024*1024):.1f}MB")
     print(f"   📊 Max total PDF content: {TOTAL_PDF_LIMIT/(1024*1024):.1f}MB")
-    print(f"   📄 Max pages per PDF: {MAX_PAGES_PER_PDF}")
-    
-    # Show all PDFs that will be processed
-    print(f"\n📋 PDFs to be processed:")
-    for i, pdf_url in enumerate(pdfs_to_process, 1):
-        filename = os.path.basename(pdf_url)
-        print(f"   {i}. {filename}")
-        print(f"      URL: {pdf_url}")
-    
-    if len(pdf_links) > max_pdfs_limit:
-        print(f"\n⚠️ Note: {len(pdf_links) - max_pdfs_limit} additional PDFs found but skipped due to limit")
-        print("   Skipped PDFs:")
-        for i, pdf_url in enumerate(pdf_links[max_pdfs_limit:], max_pdfs_limit + 1):
-            filename = os.path.basename(pdf_url)
-            print(f"   {i}. {filename}")
-    
-    pdf_documents = []
+    print(f"   ⏰ Max extraction time per page: {extraction_pool.page_timeout}s")
+    
+    pdf_urls = []  # PDF index -> URL, in the order the crawl found them
+    waiting = deque()  # PDF indexes not yet downloading
+    in_progress = {}  # PDF index -> pages received so far
+    finished = {}  # PDF index -> page Documents, held until every earlier PDF is delivered
+    next_delivery = 0
+    # Downloads may run this far ahead of the next PDF to deliver, which bounds the PDFs held in finished
+    lookahead = fetcher.concurrency + extraction_pool.max_workers
+    temp_files = {}
+    processed_pdfs = []
+    skipped_pdfs = 0
     total_size = 0
-    successful_pdfs = 0
-    failed_pdfs = 0
     
-    print(f"\n🔄 Starting PDF processing...")
-    print("=" * 60)
+    def complete(i, page_documents):
+        """Record a finished PDF and deliver every PDF that is now next in link order"""
+        nonlocal next_delivery
+        finished[i] = page_documents
+        while next_delivery in finished:
+            deliver(next_delivery, finished.pop(next_delivery))
+            next_delivery += 1
     
-    for i, pdf_url in enumerate(pdfs_to_process, 1):
-        filename = os.path.basename(pdf_url)
-        print(f"\n📄 Processing PDF {i}/{len(pdfs_to_process)}: {filename}")
-        print(f"🔗 URL: {pdf_url}")
+    def deliver(i, page_documents):
+        """Hand a finished PDF to the chunking stage, within the total size limit"""
+        nonlocal total_size
+        filename = os.path.basename(pdf_urls[i])
         
         # Check if we've hit the total size limit
         if total_size > TOTAL_PDF_LIMIT:
-            print(f"⚠️ Reached total PDF size limit ({TOTAL_PDF_LIMIT/(1024*1024):.1f}MB)")
-            print(f"   Stopping processing. Remaining PDFs will be skipped.")
-            break
+            stats['failed_pdfs'] += 1
+            print(f"   ⚠️ Skipping {filename}: reached total PDF size limit ({TOTAL_PDF_LIMIT/(1024*1024):.1f}MB)")
+            return
         
-        doc = download_and_process_pdf(pdf_url)
+        if not page_documents:
+            stats['failed_pdfs'] += 1
+            print(f"   ❌ FAILED {i + 1}: Could not process {filename}")
+            return
         
-        if doc:
-            pdf_documents.append(doc)
-            content_size = len(doc.page_content)
-            total_size += content_size
-            successful_pdfs += 1
-            
-            print(f"   ✅ SUCCESS: {doc.metadata['filename']}")
-            print(f"   📊 Pages processed: {doc.metadata.get('pages', 'unknown')}")
-            print(f"   📊 Content size: {content_size/1024:.1f}KB")
-            print(f"   📊 Running total: {total_size/(1024*1024):.1f}MB")
-        else:
-            failed_pdfs += 1
-            print(f"   ❌ FAILED: Could not process {filename}")
+        content_size = sum(len(doc.page_content) for doc in page_documents)
+        total_size += content_size
+        stats['pdf_files'] += 1
+        stats['pdf_pages'] += len(page_documents)
+        processed_pdfs.append((filename, len(page_documents), content_size))
         
-        # Add delay between PDF processing to be respectful to the server
-        if i < len(pdfs_to_process):  # Don't delay after the last PDF
-            time.sleep(5)  # Increased delay between PDF processing
+        print(f"   ✅ SUCCESS {i + 1}: {filename}")
+        print(f"   📊 Pages with text: {len(page_documents)}")
+        print(f"   📊 Content size: {content_size/1024:.1f}KB")
+        print(f"   📊 Running total: {total_size/(1024*1024):.1f}MB")
+        document_queue.put((pdf_urls[i], page_documents))
+    
+    try:
+        with ThreadPoolExecutor(max_workers=fetcher.concurrency) as executor:
+            downloads = {}
+            
+            def accept(pdf_url):
+                nonlocal skipped_pdfs
+                if len(pdf_urls) >= max_pdfs_limit or total_size > TOTAL_PDF_LIMIT:
+                    skipped_pdfs += 1
+                    reason = f"PDF limit ({max_pdfs_limit})" if len(pdf_urls) >= max_pdfs_limit else "total PDF size limit"
+                    print(f"   ⚠️ Skipping {os.path.basename(pdf_url)}: {reason} reached")
+                    return
+                pdf_urls.append(pdf_url)
+                waiting.append(len(pdf_urls) - 1)
+                print(f"   📋 PDF {len(pdf_urls)} queued: {os.path.basename(pdf_url)}")
+            
+            def start_downloads():
+                # Past the total size limit nothing more would be delivered - don't download it
+                while waiting and total_size > TOTAL_PDF_LIMIT:
+                    i = waiting.popleft()
+                    complete(i, None)
+                while waiting and waiting[0] < next_delivery + lookahead:
+                    i = waiting.popleft()
+                    downloads[executor.submit(fetch_pdf_for_extraction, pdf_urls[i], fetcher, cache)] = i
+            
+            while not pdf_link_queue.ended or waiting or downloads or extraction_pool.pending():
+                # Nothing to do until the crawl finds another PDF
+                if not waiting and not downloads and not extraction_pool.pending():
+                    pdf_url = pdf_link_queue.get()
+                    if not pdf_link_queue.ended:
+                        accept(pdf_url)
+                
+                # Pick up every PDF link the crawl has found since the last pass
+                while not pdf_link_queue.ended:
+                    try:
+                        pdf_url = pdf_link_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not pdf_link_queue.ended:
+                        accept(pdf_url)
+                start_downloads()
+                
+                # Downloaded PDFs go straight to a free extraction process
+                if downloads:
+                    done, _ = wait(downloads, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i = downloads.pop(future)
+                        status, payload = future.result()
+                        if status == 'downloaded':
+                            pdf_path, is_temp_file = payload
+                            if is_temp_file:
+                                temp_files[i] = pdf_path
+                            in_progress[i] = []
+                            extraction_pool.submit(i, pdf_path)
+                        else:
+                            complete(i, payload or [])
+                
+                for i, kind, payload in extraction_pool.poll(timeout=0 if downloads else 0.1):
+                    pdf_url = pdf_urls[i]
+                    filename = os.path.basename(pdf_url)
+                    
+                    if kind == 'page':
+                        page_number, total_pages, text = payload
+                        in_progress[i].append(build_pdf_page_document(pdf_url, page_number, total_pages, text))
+                        
+                        # Show progress for larger PDFs
+                        if total_pages > 5 and page_number % 25 == 0:
+                            print(f"      📄 {filename}: Processed {page_number}/{total_pages} pages...")
+                        continue
+                    
+                    if kind == 'page_error':
+                        page_number, error = payload
+                        print(f"      ⚠️ {filename}: Error processing page {page_number}: {error}")
+                        continue
+                    
+                    if i in temp_files:
+                        os.unlink(temp_files.pop(i))
+                    page_documents = in_progress.pop(i)
+                    
+                    if kind == 'done':
+                        complete(i, finish_pdf(pdf_url, page_documents, cache))
+                    else:
+                        print(f"   ❌ {filename}: Text extraction failed: {payload}")
+                        complete(i, [])
+    finally:
+        extraction_pool.close()
+        # Clean up temporary files
+        for temp_file_path in temp_files.values():
+            try:
+                os.unlink(temp_file_path)
+            except OSError:
+                pass
     
     print(f"\n" + "=" * 60)
     print(f"📊 PDF Processing Complete!")
-    print(f"   ✅ Successfully processed: {successful_pdfs} PDFs")
-    print(f"   ❌ Failed to process: {failed_pdfs} PDFs")
+    print(f"   ✅ Successfully processed: {stats['pdf_files']} PDFs")
+    print(f"   ❌ Failed to process: {stats['failed_pdfs']} PDFs")
+    if skipped_pdfs:
+        print(f"   ⚠️ Skipped due to the PDF limit: {skipped_pdfs} PDFs")
     print(f"   📝 Total PDF content: {total_size/(1024*1024):.1f}MB")
-    print(f"   📄 Total PDF documents: {len(pdf_documents)}")
+    print(f"   📄 Total PDF page documents: {stats['pdf_pages']}")
     
-    if successful_pdfs > 0:
+    if processed_pdfs:
         print(f"\n📋 Successfully processed PDFs:")
-        for i, doc in enumerate(pdf_documents, 1):
-            filename = doc.metadata.get('filename', 'unknown.pdf')
-            pages = doc.metadata.get('pages', 'unknown')
-            size_kb = len(doc.page_content) / 1024
-            print(f"   {i}. {filename} ({pages} pages, {size_kb:.1f}KB)")
-    
-    return pdf_documents
+        for i, (filename, pages, content_size) in enumerate(processed_pdfs, 1):
+            print(f"   {i}. {filename} ({pages} pages, {content_size/1024:.1f}KB)")
 
-def get_all_links(base_url, max_pages=50):
+def crawl_pages(base_url, max_pages=50, fetcher=None, sitemap_urls=None, checkpoint=None):
     """
-    Scrape the website to find all internal links
+    Scrape the website, yielding each internal page as soon as it is fetched and parsed.
+    Pages are fetched concurrently; the fetcher's per-host rate limiter keeps us polite.
+    Each page is parsed once and comes with its links, PDF links and Document.
+    Sitemap URLs are visited first; following links only fills the remaining budget.
+    With a checkpoint, fetched pages and the frontier are saved as the crawl goes
+    and an interrupted crawl picks up where it stopped.
     """
-    visited = set()
-    to_visit = [base_url]
-    all_links = []
+    skip_extensions = ['.pdf', '.jpg', '.png', '.gif', '.doc', '.docx']
+    sitemap_urls = sitemap_urls or {}
+    base_url = canonicalize_url(base_url)
+    base_netloc = urlparse(base_url).netloc
     
-    print(f"🕷️ Starting to scrape {base_url}...")
+    # Deque + seen-set over canonical URLs keeps the crawl linear in the number of links
+    frontier = CrawlFrontier()
+    frontier.add(base_url, trusted=True)
+    for url in sitemap_urls:
+        if not any(url.lower().endswith(ext) for ext in skip_extensions):
+            frontier.add(url, trusted=True)
     
-    while to_visit and len(all_links) < max_pages:
-        current_url = to_visit.pop(0)
-        
-        if current_url in visited:
-            continue
-            
-        visited.add(current_url)
-        
-        try:
-            print(f"📄 Scraping: {current_url}")
-            response = requests.get(current_url, timeout=10)
-            response.raise_for_status()
+    pages_fetched = 0
+    restored_pages = []
+    in_flight = {}
+    fetcher = fetcher or PoliteFetcher()
+    
+    def queue_links(page):
+        for full_url in page.links:
+            # Only include links from the same domain
+            if urlparse(full_url).netloc.lower() == base_netloc:
+                # Skip certain file types; fragments are dropped by canonicalization
+                if not any(full_url.lower().endswith(ext) for ext in skip_extensions):
+                    frontier.add(full_url)
+    
+    if checkpoint is not None:
+        frontier_state, restored_pages = checkpoint.load_crawl()
+        if frontier_state is not None:
+            frontier.restore(frontier_state, done_urls=[page.url for page in restored_pages])
+        # Links of pages fetched after the last frontier checkpoint
+        for page in restored_pages:
+            queue_links(page)
+        if restored_pages:
+            print(f"⏯️ Resuming crawl: {len(restored_pages)} pages already fetched, {len(frontier)} queued")
+    
+    # Pages fetched before an interruption still have to go through the rest of the pipeline
+    restored_pages.reverse()
+    while restored_pages:
+        pages_fetched += 1
+        yield restored_pages.pop()
+    
+    print(f"🕷️ Starting to scrape {base_url} ({fetcher.concurrency} concurrent requests, {len(frontier)} seed URLs)...")
+    
+    with ThreadPoolExecutor(max_workers=fetcher.concurrency) as executor:
+        while (frontier or in_flight) and pages_fetched < max_pages:
+            # Keep the pool busy without fetching more pages than the budget allows
+            while frontier and len(in_flight) < fetcher.concurrency and pages_fetched + len(in_flight) < max_pages:
+                current_url = frontier.pop()
+                
+                if not fetcher.can_fetch(current_url):
+                    print(f"🚫 Disallowed by robots.txt: {current_url}")
+                    continue
+                
+                print(f"📄 Scraping: {current_url}")
+                # A sitemap lastmod older than our cached copy means no request is needed
+                lastmod = sitemap_urls.get(current_url)
+                in_flight[executor.submit(fetcher.fetch, current_url, lastmod=lastmod)] = current_url
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            if not in_flight:
+                break
             
-            # Add current URL to our list
-            all_links.append(current_url)
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
             
-            # Find all links on this page
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                full_url = urljoin(current_url, href)
+            for future in done:
+                current_url = in_flight.pop(future)
                 
-                # Only include links from the same domain
-                if urlparse(full_url).netloc == urlparse(base_url).netloc:
-                    # Skip certain file types and fragments
-                    if not any(full_url.lower().endswith(ext) for ext in ['.pdf', '.jpg', '.png', '.gif', '.doc', '.docx']):
-                        if '#' not in full_url and full_url not in visited and full_url not in to_visit:
-                            to_visit.append(full_url)
-            
-            # Be respectful - increased delay between wets
-            time.sleep(2.5)
-            
-        except Exception as e:
-            print(f"⚠️ Error scraping {current_url}: {e}")
+                try:
+                    response = future.result()
+                    response.raise_for_status()
+                    
+                    page = parse_page(current_url, response.content, base_url, link_base=response.final_url)
+                    
+                    # Queue the links found on this page
+                    queue_links(page)
+                    
+                    if checkpoint is not None:
+                        checkpoint.record_page(page)
+                    
+                except Exception as e:
+                    print(f"⚠️ Error scraping {current_url}: {e}")
+                    continue
+                
+                pages_fetched += 1
+                if checkpoint is not None and pages_fetched % CRAWL_CHECKPOINT_EVERY == 0:
+                    checkpoint.save_frontier(frontier.to_state(in_flight.values()))
+                
+                # Hand the page to the next stage; blocks while that stage is behind
+                yield page
+    
+    if checkpoint is not None:
+        checkpoint.save_frontier(frontier.to_state(in_flight.values()))
+        checkpoint.close_pages()
+    
+    print(f"✅ Crawl finished: {pages_fetched} pages fetched")
+    frontier.print_summary()
+
+def crawl_stage(base_url, max_pages, fetcher, sitemap_urls, checkpoint, page_queue, pdf_link_queue):
+    """
+    Crawl stage of the pipeline - pages go to template removal, new PDF links to the PDF stage
+    """
+    pdf_links = set()
+    
+    for page in crawl_pages(base_url, max_pages, fetcher, sitemap_urls, checkpoint):
+        page_queue.put(page)
+        
+        # PDF links collected when the page was parsed - no pages are re-downloaded
+        for pdf_url in page.pdf_links:
+            if pdf_url not in pdf_links:
+                pdf_links.add(pdf_url)
+                print(f"   📄 Found PDF: {pdf_url}")
+                pdf_link_queue.put(pdf_url)
+    
+    print(f"✅ Found {len(pdf_links)} unique PDF files")
+
+def document_stage(page_queue, document_queue, stats):
+    """
+    Template removal stage - the site template is learned from the first pages,
+    then stripped from every page as it arrives.
+    Passes on (source, [Document]) for each page with content.
+    """
+    boilerplate = BoilerplateFilter()
+    sample = []
+    
+    def emit(page):
+        stats['pages_seen'] += 1
+        print(f"📖 Loading content from ({stats['pages_seen']}): {page.url}")
+        document = boilerplate.strip(page.document)
+        
+        # Verify we got content
+        if document.page_content.strip():
+            stats['web_pages'] += 1
+            print(f"   ✅ Loaded {len(document.page_content)} characters (of {len(page.document.page_content)} on the page)")
+            document_queue.put((document.metadata.get('source', page.url), [document]))
+        else:
+            print(f"   ⚠️ No content found")
+            stats['failed_pages'] += 1
+    
+    for page in page_queue:
+        if sample is None:
+            emit(page)
             continue
+        
+        # Hold back the first pages until there are enough to learn the navigation,
+        # header and footer text repeated across the site
+        sample.append(page)
+        if len(sample) >= BOILERPLATE_SAMPLE_PAGES:
+            boilerplate.learn([sampled.document for sampled in sample])
+            for sampled in sample:
+                emit(sampled)
+            sample = None
     
-    print(f"✅ Found {len(all_links)} pages to index")
-    return all_links
+    # Small sites never fill the sample
+    if sample:
+        boilerplate.learn([sampled.document for sampled in sample])
+        for sampled in sample:
+            emit(sampled)
+    
+    boilerplate.print_summary()
 
-def load_and_process_website(base_url, max_pages=50, max_pdfs=10):
+def split_document(doc, chunker, stats):
     """
-    Load multiple pages from the website and create a comprehensive vector database with PDF support
+    Split one document along its headings / paragraphs and drop chunks that are too large to embed
     """
-    print("🌐 Enhanced Westlake High School Website + PDF Loader")
-    print("=" * 60)
+    # Skip documents that are extremely large
+    if len(doc.page_content) > 200000:  # Skip docs over 200k characters (increased for PDFs)
+        print(f"   ⚠️ {doc.metadata.get('source')}: {len(doc.page_content)} chars - TOO LARGE, SKIPPING")
+        return []
     
-    # Get all links to scrape
-    all_urls = get_all_links(base_url, max_pages)
+    is_pdf = doc.metadata.get('type') == 'pdf'
+    doc_type = "PDF" if is_pdf else "Web"
     
-    # Find and process PDF files
-    pdf_links = find_pdf_links(base_url, all_urls)
-    pdf_documents = process_all_pdfs(pdf_links, max_pdfs)
+    chunks = chunker.split_document(doc)
     
-    print(f"\n📚 Loading content from {len(all_urls)} web pages...")
+    # Filter out chunks that are still too large
+    valid_chunks = []
+    for chunk in chunks:
+        chunk_tokens = chunk.metadata['tokens']
+        if chunk_tokens < 8000:  # Well below 8192 token limit
+            # Add source type to chunk metadata
+            chunk.metadata['content_type'] = doc_type.lower()
+            if is_pdf:
+                chunk.metadata['filename'] = doc.metadata.get('filename', 'unknown.pdf')
+                chunk.metadata['source_pages'] = doc.metadata.get('page', 'unknown')
+            
+            valid_chunks.append(chunk)
+            stats['max_chunk_size'] = max(stats['max_chunk_size'], len(chunk.page_content))
+            stats['max_chunk_tokens'] = max(stats['max_chunk_tokens'], chunk_tokens)
+            stats['total_tokens'] += chunk_tokens
+        else:
+            print(f"   ⚠️ Skipping oversized chunk: {chunk_tokens} tokens")
     
-    # Load content from all URLs
-    all_docs = []
-    successful_loads = 0
-    failed_loads = 0
+    stats['total_chars'] += len(doc.page_content)
+    stats['chunks_created'] += len(valid_chunks)
     
-    for i, url in enumerate(all_urls, 1):
-        try:
-            print(f"📖 Loading content from ({i}/{len(all_urls)}): {url}")
-            loader = WebBaseLoader(url)
-            docs = loader.load()
+    if is_pdf:
+        filename = doc.metadata.get('filename', 'unknown.pdf')
+        page = doc.metadata.get('page', 'unknown')
+        print(f"   📄 {doc_type} ({filename}, page {page}): {len(doc.page_content)} chars → {len(valid_chunks)} valid chunks")
+    else:
+        print(f"   📄 {doc_type} ({doc.metadata.get('source')}): {len(doc.page_content)} chars → {len(valid_chunks)} valid chunks")
+    return valid_chunks
+
+def seed_deduplicator(deduplicator, vectordb, manifest):
+    """
+    Register the chunks the previous build indexed, so new or edited sources that
+    repeat one of them (a shared notice, a re-posted PDF) point at it instead of
+    embedding another copy
+    """
+    start = time.time()
+    referenced = {chunk_id for entry in manifest.get('documents', {}).values() for chunk_id in entry.get('chunk_ids', [])}
+    for chunk_id in vectordb.index_to_docstore_id.values():
+        if chunk_id in referenced:
+            doc = vectordb.docstore.search(chunk_id)
+            if isinstance(doc, Document):
+                deduplicator.add_existing(doc, chunk_id)
+    print(f"   🧬 Duplicate check seeded with {len(deduplicator.sources):,} indexed chunks in {time.time() - start:.1f}s")
+
+def chunk_stage(document_queue, chunk_queue, chunker, planner, deduplicator, stats):
+    """
+    Chunking stage - skip unchanged sources, split the rest, drop duplicate chunks.
+    Sends ('chunk', chunk, chunk_id) for each chunk to embed, ('keep', chunk, chunk_id) for chunks
+    of an edited source whose text (and so vector) is unchanged, ('delete', chunk_ids) for chunks
+    that no longer exist, and ('source_done', source, manifest_entry) after a source's chunks.
+    """
+    def process(source, docs, previous_ids=()):
+        previous_ids = set(previous_ids)
+        # The source's old chunks are matched again only if its new text reproduces them
+        for chunk_id in previous_ids:
+            deduplicator.discard(chunk_id)
+        source_chunk_ids = []
+        kept_ids = set()
+        for doc in docs:
+            valid_chunks = split_document(doc, chunker, stats)
             
-            # Verify we got content
-            if docs and docs[0].page_content.strip():
-                all_docs.extend(docs)
-                successful_loads += 1
-                print(f"   ✅ Loaded {len(docs[0].page_content)} characters")
-            else:
-                print(f"   ⚠️ No content found")
-                failed_loads += 1
-                
-        except Exception as e:
-            print(f"   ❌ Failed to load: {e}")
-            failed_loads += 1
+            # Content-addressed IDs - with content-defined boundaries, an edit only changes the chunks around it
+            chunk_ids = assign_chunk_ids(source, valid_chunks)
+            for chunk, chunk_id in zip(valid_chunks, chunk_ids):
+                # Embed each group of exact or near-duplicate chunks only once
+                duplicate_of = deduplicator.add(chunk, chunk_id)
+                if duplicate_of is None:
+                    if chunk_id in previous_ids:
+                        chunk_queue.put(('keep', chunk, chunk_id))
+                        kept_ids.add(chunk_id)
+                        stats['chunks_kept'] += 1
+                    else:
+                        chunk_queue.put(('chunk', chunk, chunk_id))
+                        stats[f"{chunk.metadata['content_type']}_chunks"] += 1
+                source_chunk_ids.append(duplicate_of or chunk_id)
+        
+        # This source's old chunks that the edit removed or changed - unless another source now points at them
+        removed = sorted(previous_ids - kept_ids - planner.borrowed(previous_ids))
+        if removed:
+            chunk_queue.put(('delete', removed))
+        
+        # Sources whose chunks were dropped now point at the copy that was kept
+        planner.record(source, list(dict.fromkeys(source_chunk_ids)))
+        chunk_queue.put(('source_done', source, planner.documents[source]))
+    
+    # Incremental mode - only sources whose content changed since the last build get re-embedded
+    for source, docs in document_queue:
+        changed, previous_ids = planner.check(source, docs)
+        if not changed:
             continue
+        process(source, docs, previous_ids)
     
-    # Add PDF documents to the main document collection
-    all_docs.extend(pdf_documents)
+    # Removed sources, and unchanged ones that shared a chunk with a changed source
+    stale_chunk_ids, sources_to_reembed = planner.finish()
+    if stale_chunk_ids:
+        chunk_queue.put(('delete', stale_chunk_ids))
+    for chunk_id in stale_chunk_ids:
+        deduplicator.discard(chunk_id)
+    for source, docs in sources_to_reembed:
+        print(f"   🔗 Re-embedding {source}: it shared a chunk with a changed source")
+        process(source, docs)
     
-    print(f"\n📊 Loading Summary:")
-    print(f"   ✅ Successfully loaded web pages: {successful_loads}")
-    print(f"   ✅ Successfully loaded PDFs: {len(pdf_documents)}")
-    print(f"   ❌ Failed to load: {failed_loads} pages")
-    print(f"   📄 Total documents before splitting: {len(all_docs)} (web + PDF)")
+    print(f"\n📊 Chunking Summary:")
+    print(f"   ♻️ Unchanged sources (kept as-is): {planner.unchanged_sources}")
+    print(f"   ✏️ New or changed sources: {planner.changed_sources}")
+    print(f"   ♻️ Unchanged chunks in changed sources (vectors kept): {stats['chunks_kept']}")
+    print(f"   📄 Total chunks created: {stats['chunks_created']}")
+    print(f"   🧬 Duplicates removed: {deduplicator.exact_duplicates} exact, {deduplicator.near_duplicates} near-duplicate")
+    print(f"   📝 Total characters processed: {stats['total_chars']:,}")
+    print(f"   📊 Average chunk size: {stats['total_chars'] // stats['chunks_created'] if stats['chunks_created'] else 0} chars")
+    print(f"   📊 Average chunk tokens: {stats['total_tokens'] // stats['chunks_created'] if stats['chunks_created'] else 0} (target: {CHUNK_TARGET_TOKENS}, max: {CHUNK_MAX_TOKENS})")
+    print(f"   📊 Largest chunk size: {stats['max_chunk_size']} chars, {stats['max_chunk_tokens']} tokens")
+
+def embed_stage(chunk_queue, embedded_queue, embeddings_model, stats):
+    """
+    Embedding stage - sends large batches to the API concurrently as chunks arrive.
+    The adaptive limiter backs off when the API rate-limits us; results, deletes, kept chunks and
+    source markers are passed on in submission order, and markers wait for the batch holding their chunks.
+    """
+    limiter = AdaptiveLimiter(EMBEDDING_CONCURRENCY)
+    pending = deque()  # In submission order: ('batch', future, chunks, ids) or a pass-through item
+    batch_chunks = []
+    batch_ids = []
+    held_markers = []
     
-    if not all_docs:
-        print("❌ No content was successfully loaded!")
-        return
+    def embed(texts):
+        vectors = embed_with_backoff(embeddings_model, texts, limiter)
+        return np.asarray(vectors, dtype=np.float32)
     
-    # Split all documents into chunks for better embedding
-    print(f"\n✂️ Splitting documents into chunks...")
+    def submit():
+        if batch_chunks:
+            stats['batches'] += 1
+            print(f"   📦 Batch {stats['batches']}: Embedding {len(batch_chunks)} chunks...")
+            future = executor.submit(embed, [chunk.page_content for chunk in batch_chunks])
+            pending.append(('batch', future, list(batch_chunks), list(batch_ids)))
+            batch_chunks.clear()
+            batch_ids.clear()
+        pending.extend(held_markers)
+        held_markers.clear()
     
-    # Use different splitters for web content vs PDF content
-    web_text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=600,  # Smaller chunks for web content
-        chunk_overlap=100,
-        length_function=len
-    )
+    def drain(block):
+        # Hand on finished work in order; block while too many batches are in flight
+        while pending:
+            head = pending[0]
+            if head[0] == 'batch':
+                in_flight = sum(1 for item in pending if item[0] == 'batch')
+                if not head[1].done() and not (block or in_flight > EMBEDDING_CONCURRENCY * 2):
+                    return
+                _, future, chunks, chunk_ids = head
+                vectors = future.result()
+                stats['embedded'] += len(chunks)
+                stats['estimated_tokens'] += sum(chunk.metadata['tokens'] for chunk in chunks)
+                embedded_queue.put(('batch', chunks, chunk_ids, vectors))
+            else:
+                embedded_queue.put(head)
+            pending.popleft()
     
-    pdf_text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=PDF_CHUNK_SIZE,  # Larger chunks for PDF content
-        chunk_overlap=150,  # More overlap for PDFs to maintain context
-        length_function=len
-    )
+    with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as executor:
+        for item in chunk_queue:
+            if item[0] == 'chunk':
+                batch_chunks.append(item[1])
+                batch_ids.append(item[2])
+                if len(batch_chunks) >= EMBEDDING_BATCH_SIZE:
+                    submit()
+            elif item[0] in ('delete', 'keep'):
+                pending.append(item)
+            else:
+                held_markers.append(item)
+            drain(block=False)
+        
+        submit()
+        drain(block=True)
     
-    all_chunks = []
-    total_chars = 0
-    max_chunk_size = 0
+    if limiter.rate_limited:
+        print(f"   ⏳ Rate limited {limiter.rate_limited} times - finished with {limiter.limit} requests in flight")
+
+def index_stage(embedded_queue, vectordb, embeddings_model, checkpoint, committed, stats):
+    """
+    Index stage (runs on the main thread, the only writer to the index).
+    Embedded vectors collect in the index writer's buffer and are added in bulk, after
+    any pending deletes. The index is snapshotted every few batches with the manifest
+    entries of the sources it fully contains. Returns the index.
+    """
+    writer = IndexWriter(vectordb, embeddings_model)
+    committed_batches = checkpoint.committed_batches
     
-    for i, doc in enumerate(all_docs):
-        # Skip documents that are extremely large
-        if len(doc.page_content) > 200000:  # Skip docs over 200k characters (increased for PDFs)
-            print(f"   ⚠️ Document {i+1}: {len(doc.page_content)} chars - TOO LARGE, SKIPPING")
+    for item in embedded_queue:
+        kind = item[0]
+        if kind == 'delete':
+            writer.delete(item[1])
+            continue
+        if kind == 'keep':
+            writer.refresh(item[1], item[2])
+            continue
+        if kind == 'source_done':
+            _, source, entry = item
+            committed[source] = entry
             continue
         
-        # Determine document type and use appropriate splitter
-        is_pdf = doc.metadata.get('type') == 'pdf'
-        splitter = pdf_text_splitter if is_pdf else web_text_splitter
-        doc_type = "PDF" if is_pdf else "Web"
+        _, chunks, chunk_ids, vectors = item
+        writer.add(chunks, chunk_ids, vectors)
         
-        chunks = splitter.split_documents([doc])
+        # Commit progress periodically so a crash doesn't lose the batches embedded so far
+        committed_batches += 1
+        if committed_batches % EMBED_CHECKPOINT_EVERY == 0:
+            vectordb = writer.flush()
+            checkpoint.save_index_snapshot(vectordb, committed, committed_batches)
+            print(f"   💾 Checkpoint: {committed_batches} batches committed ({vectordb.index.ntotal} vectors)")
+    
+    vectordb = writer.flush()
+    stats['deleted'] += writer.deleted
+    return vectordb
+
+def load_and_process_website(base_url, max_pages=50, max_pdfs=10, concurrency=CRAWL_CONCURRENCY, incremental=True, resume=True):
+    """
+    Load multiple pages from the website and create a comprehensive vector database with PDF support.
+    Crawling, PDF processing, template removal, chunking, embedding and indexing run as a pipeline
+    of stages connected by bounded queues, so they overlap and memory stays bounded.
+    """
+    print("🌐 Enhanced Westlake High School Website + PDF Loader")
+    print("=" * 60)
+    
+    # Every build is published as a new version under the index root; the last published one is the base
+    index_root = INDEX_ROOT
+    index_Faiss_Filepath = current_index_path(index_root) or index_root
+    embedding_model_name = "text-embedding-3-small"
+    
+    # Chunks follow headings (web pages) and paragraphs (PDF pages), packed to a token target
+    chunker = StructureChunker()
+    
+    # Progress is checkpointed so a crashed run resumes instead of starting over
+    checkpoint = RunCheckpoint(
+        {
+            'base_url': base_url,
+            'max_pages': max_pages,
+            'max_pdfs': max_pdfs,
+            'incremental': incremental,
+            'embedding_model': embedding_model_name,
+            'chunking': chunker.signature,
+            'dimensions': EMBEDDING_DIMENSIONS
+        },
+        resume=resume
+    )
+    
+    # Initialize embeddings model - the local cache is checked before any API call
+    # and holds full vectors; they are truncated to EMBEDDING_DIMENSIONS on the way out
+    embeddings_model = truncated_embeddings(
+        CachedEmbeddings(
+            OpenAIEmbeddings(
+                openai_api_key=OPENAI_API_KEY, 
+                model=embedding_model_name,
+                max_retries=0  # Rate limits are retried by the embedding stage's adaptive limiter
+            ),
+            embedding_model_name
+        ),
+        EMBEDDING_DIMENSIONS
+    )
+    
+    # Continue from the index snapshot of an interrupted run, or from the last build
+    vectordb, committed = checkpoint.load_index_snapshot(embeddings_model)
+    if vectordb is not None:
+        manifest = load_manifest(index_Faiss_Filepath) if incremental else None
+        if manifest and (manifest.get('embedding_model') != embedding_model_name or manifest.get('chunking') != chunker.signature
+                         or manifest.get('dimensions') != EMBEDDING_DIMENSIONS):
+            manifest = None
+        previous = manifest.get('documents', {}) if manifest else {}
+        manifest = {'documents': dict(previous, **committed)}
+        print(f"   ⏯️ Resuming with {vectordb.index.ntotal} vectors after {checkpoint.committed_batches} committed batches ({len(committed)} sources)")
+    elif incremental:
+        # Incremental mode - only sources whose content changed since the last build get re-embedded
+        print(f"\n🔁 Checking {index_Faiss_Filepath} for an incremental update...")
+        vectordb, manifest = load_existing_index(index_Faiss_Filepath, embeddings_model, embedding_model_name, chunker.signature, EMBEDDING_DIMENSIONS)
+    else:
+        manifest = None
+    
+    planner = IncrementalPlanner(manifest)
+    deduplicator = ChunkDeduplicator()
+    if vectordb is not None and manifest:
+        seed_deduplicator(deduplicator, vectordb, manifest)
+    stats = Counter()
+    
+    # Bodies and validators from the previous run, so unchanged pages and PDFs answer 304
+    http_cache = HttpCache(HTTP_CACHE_DIR)
+    
+    # One pooled session and rate limiter shared by every crawl stage
+    fetcher = PoliteFetcher(concurrency=concurrency, cache=http_cache)
+    
+    # Sitemaps list most of the site up front; link following covers what they miss
+    sitemap_urls = discover_sitemap_urls(fetcher, base_url)
+    
+    # Wire up the stages - each bounded queue blocks its producer while the consumer is behind
+    pipeline = Pipeline()
+    page_queue = pipeline.queue(PAGE_QUEUE_SIZE)
+    pdf_link_queue = pipeline.queue(PDF_LINK_QUEUE_SIZE)
+    document_queue = pipeline.queue(DOCUMENT_QUEUE_SIZE, producers=2)  # Web pages and PDFs
+    chunk_queue = pipeline.queue(CHUNK_QUEUE_SIZE)
+    embedded_queue = pipeline.queue(EMBEDDED_QUEUE_SIZE)
+    
+    print(f"\n🧠 Embedding with {embedding_model_name} as chunks arrive (batches of {EMBEDDING_BATCH_SIZE}, up to {EMBEDDING_CONCURRENCY} in flight)...")
+    
+    try:
+        pipeline.start("crawl", crawl_stage, base_url, max_pages, fetcher, sitemap_urls, checkpoint, page_queue, pdf_link_queue,
+                       outputs=(page_queue, pdf_link_queue))
+        pipeline.start("pdf", process_pdf_stream, pdf_link_queue, document_queue, max_pdfs, http_cache, fetcher, stats,
+                       outputs=(document_queue,))
+        pipeline.start("documents", document_stage, page_queue, document_queue, stats,
+                       outputs=(document_queue,))
+        pipeline.start("chunk", chunk_stage, document_queue, chunk_queue, chunker, planner, deduplicator, stats,
+                       outputs=(chunk_queue,))
+        pipeline.start("embed", embed_stage, chunk_queue, embedded_queue, embeddings_model, stats,
+                       outputs=(embedded_queue,))
         
-        # Filter out chunks that are still too large
-        valid_chunks = []
-        for chunk in chunks:
-            chunk_tokens = len(chunk.page_content.split()) * 1.3  # Rough token estimate
-            if chunk_tokens < 8000:  # Well below 8192 token limit
-                # Add source type to chunk metadata
-                chunk.metadata['content_type'] = doc_type.lower()
-                if is_pdf:
-                    chunk.metadata['filename'] = doc.metadata.get('filename', 'unknown.pdf')
-                    chunk.metadata['source_pages'] = doc.metadata.get('pages', 'unknown')
-                
-                valid_chunks.append(chunk)
-                max_chunk_size = max(max_chunk_size, len(chunk.page_content))
-            else:
-                print(f"   ⚠️ Skipping oversized chunk: {int(chunk_tokens)} tokens")
+        try:
+            vectordb = index_stage(embedded_queue, vectordb, embeddings_model, checkpoint, committed, stats)
+        except PipelineStopped:
+            pass
+        except Exception:
+            pipeline.stop()
+            raise
+        pipeline.join()
         
-        all_chunks.extend(valid_chunks)
-        total_chars += len(doc.page_content)
+        http_cache.print_summary()
+        pruned, pruned_bytes = http_cache.prune()
+        if pruned:
+            print(f"   🧹 Pruned {pruned} unused or least recently used cache entries ({pruned_bytes/(1024*1024):.1f}MB)")
         
-        if is_pdf:
-            filename = doc.metadata.get('filename', 'unknown.pdf')
-            pages = doc.metadata.get('pages', 'unknown')
-            print(f"   📄 {doc_type} {i+1} ({filename}, {pages} pages): {len(doc.page_content)} chars → {len(valid_chunks)} valid chunks")
-        else:
-            print(f"   📄 {doc_type} {i+1}: {len(doc.page_content)} chars → {len(valid_chunks)} valid chunks")
-    
-    print(f"\n📊 Chunking Summary:")
-    print(f"   📄 Total chunks created: {len(all_chunks)}")
-    print(f"   📝 Total characters processed: {total_chars:,}")
-    print(f"   📊 Average chunk size: {total_chars // len(all_chunks) if all_chunks else 0} chars")
-    print(f"   📊 Largest chunk size: {max_chunk_size} chars")
-    print(f"   📊 Estimated max tokens per chunk: {int(max_chunk_size * 1.3)} tokens")
-    
-    # Create embeddings and save to vector database
-    if all_chunks:
-        print(f"\n🧠 Creating embeddings and building vector database...")
-        print(f"   🔄 Processing {len(all_chunks)} chunks with OpenAI embeddings...")
+        print(f"\n📊 Loading Summary:")
+        print(f"   ✅ Successfully loaded web pages: {stats['web_pages']}")
+        print(f"   ✅ Successfully loaded PDF pages: {stats['pdf_pages']}")
+        print(f"   ❌ Failed to load: {stats['failed_pages']} pages")
         
-        try:
-            # Initialize embeddings model
-            embeddings_model = OpenAIEmbeddings(
-                openai_api_key=OPENAI_API_KEY, 
-                model="text-embedding-3-small"
-            )
-            
-            # Create FAISS vector database from all chunks
-            print(f"   🔄 Converting text to embeddings...")
-            
-            # Calculate estimated token usage and cost
-            total_tokens_estimate = sum(len(chunk.page_content.split()) * 1.3 for chunk in all_chunks)  # ~1.3 tokens per word
-            
-            # OpenAI text-embedding-3-small pricing information
-            cost_per_1k_tokens = 0.00002  # $0.00002 per 1,000 tokens
-            estimated_cost = (total_tokens_estimate / 1000) * cost_per_1k_tokens
-            
-            print(f"   📊 OpenAI Model: text-embedding-3-small")
-            print(f"   📊 Max Token Limit: 8,192 tokens")
-            print(f"   📊 Embedding Dimension: 1,536")
-            print(f"   📊 Estimated tokens to be processed: {int(total_tokens_estimate):,}")
-            print(f"   💰 Estimated cost: ${estimated_cost:.6f} (${cost_per_1k_tokens} per 1K tokens)")
-            
-            # Process chunks in smaller batches to avoid API limits
-            batch_size = 50  # Process 50 chunks at a time
-            print(f"   🔄 Processing {len(all_chunks)} chunks in batches of {batch_size}...")
-            
-            if len(all_chunks) <= batch_size:
-                # Small number of chunks - process all at once
-                vectordb = FAISS.from_documents(all_chunks, embeddings_model)
-            else:
-                # Large number of chunks - process in batches
-                print(f"   📦 Batch 1/{(len(all_chunks) + batch_size - 1) // batch_size}: Processing first {min(batch_size, len(all_chunks))} chunks...")
-                vectordb = FAISS.from_documents(all_chunks[:batch_size], embeddings_model)
-                
-                # Add remaining chunks in batches
-                for i in range(batch_size, len(all_chunks), batch_size):
-                    batch_num = (i // batch_size) + 1
-                    total_batches = (len(all_chunks) + batch_size - 1) // batch_size
-                    batch_end = min(i + batch_size, len(all_chunks))
-                    batch_chunks = all_chunks[i:batch_end]
-                    
-                    print(f"   📦 Batch {batch_num}/{total_batches}: Processing chunks {i+1}-{batch_end}...")
-                    batch_vectordb = FAISS.from_documents(batch_chunks, embeddings_model)
-                    vectordb.merge_from(batch_vectordb)
-                    
-                    # Small delay between batches to be respectful to API
-                    time.sleep(1)
-            
-            # Save the vector database
-            index_Faiss_Filepath = "index.faiss"
-            print(f"   💾 Saving vector database to {index_Faiss_Filepath}...")
-            vectordb.save_local(index_Faiss_Filepath)
-            
-            print(f"\n🎉 SUCCESS! Enhanced website data with PDF support loaded and indexed!")
-            print(f"📊 Final Database Stats:")
-            print(f"   🌐 Web pages scraped: {successful_loads}")
-            print(f"   📄 PDF files processed: {len(pdf_documents)}")
-            print(f"   🧩 Total document chunks: {len(all_chunks)}")
-            print(f"   🧠 Embeddings created: {len(all_chunks)}")
-            print(f"   💾 Vector database size: {vectordb.index.ntotal} vectors")
-            
-            # Count chunks by type
-            web_chunks = sum(1 for chunk in all_chunks if chunk.metadata.get('content_type') == 'web')
-            pdf_chunks = sum(1 for chunk in all_chunks if chunk.metadata.get('content_type') == 'pdf')
-            print(f"   📊 Web content chunks: {web_chunks}")
-            print(f"   📊 PDF content chunks: {pdf_chunks}")
-            
-        except Exception as e:
-            print(f"❌ Error creating vector database: {e}")
+        if not stats['web_pages'] and not stats['pdf_pages']:
+            print("❌ No content was successfully loaded!")
+            checkpoint.finish()
             return
-            
-    else:
-        print("❌ No chunks created - cannot build vector database!")
+        
+        if vectordb is None:
+            print("❌ No chunks created - cannot build vector database!")
+            checkpoint.finish()
+            return
+        
+        # Kept chunks list every source of the duplicates dropped after they were indexed
+        for chunk_id, sources in deduplicator.sources.items():
+            if len(sources) > 1:
+                doc = vectordb.docstore.search(chunk_id)
+                if isinstance(doc, Document):
+                    doc.metadata['sources'] = sources
+        
+        # OpenAI text-embedding-3-small pricing information
+        cost_per_1k_tokens = 0.00002  # $0.00002 per 1,000 tokens
+        estimated_cost = (stats['estimated_tokens'] / 1000) * cost_per_1k_tokens
+        
+        print(f"\n🧠 Embedding Summary:")
+        print(f"   📊 OpenAI Model: {embedding_model_name}")
+        print(f"   📊 Embedding Dimension: {vectordb.index.d:,}" + (" (truncated)" if EMBEDDING_DIMENSIONS else ""))
+        print(f"   🗑️ Deleted {stats['deleted']} outdated vectors")
+        print(f"   📊 Estimated tokens processed: {int(stats['estimated_tokens']):,}")
+        print(f"   💰 Estimated cost: ${estimated_cost:.6f} (${cost_per_1k_tokens} per 1K tokens, before embedding cache hits)")
+        
+        # Save the vector database and the manifest the next incremental run compares against
+        # into a new version directory, then switch CURRENT to it - the assistant picks it up without a restart
+        version = new_version_name()
+        version_dir = version_path(index_root, version)
+        os.makedirs(version_dir)
+        if INDEX_TYPE != 'flat' or QUANTIZATION:
+            print(f"   🏗️ Building {INDEX_TYPE.upper()} index ({QUANTIZATION or 'float32'} vectors) over {vectordb.index.ntotal} vectors...")
+        index_params, vectors = convert_index(vectordb, INDEX_TYPE, QUANTIZATION)
+        index_params['bytes_per_vector'] = round(bytes_per_vector(vectordb.index))
+        print(f"   📦 Index size: {index_params['bytes_per_vector']:,} bytes per vector ({vectors.shape[1] * 4:,} as float32)")
+        if index_params['type'] != 'flat' or index_params['quantization']:
+            # Recall lost to approximate search and quantization, against exact search over the same vectors
+            apply_search_params(vectordb.index)
+            recall, reranked_recall = measure_recall(vectors, vectordb.index)
+            index_params['recall_at_8'] = round(float(recall), 4)
+            print(f"   🎯 Recall@8 vs exact search: {recall:.3f}", end="")
+            if index_params['quantization']:
+                index_params['reranked_recall_at_8'] = round(float(reranked_recall), 4)
+                print(f" ({reranked_recall:.3f} re-ranking the top {8 * RERANK_FACTOR} with float32 vectors)", end="")
+            print()
+        print(f"   💾 Saving vector database to {version_dir}...")
+        save_index(vectordb, version_dir)
+        if index_params['quantization']:
+            # Exact vectors for re-ranking, read from disk at query time instead of held in memory
+            save_rerank_vectors(version_dir, vectors)
+        del vectors
+        save_manifest(version_dir, planner.build_manifest(embedding_model_name, chunker.signature, EMBEDDING_DIMENSIONS))
+        publish_version(index_root, version, {
+            'embedding_model': embedding_model_name,
+            'dimension': vectordb.index.d,
+            'embedding_dimensions': EMBEDDING_DIMENSIONS,
+            'index': index_params,
+            'chunking': chunker.signature,
+            'chunk_target_tokens': chunker.target_tokens,
+            'chunk_max_tokens': chunker.max_tokens,
+            'chunk_min_tokens': chunker.min_tokens,
+            'built_at': time.time(),
+            'vector_count': vectordb.index.ntotal
+        })
+        print(f"   📢 Published index version {version}")
+        checkpoint.finish()
+        
+        print(f"\n🎉 SUCCESS! Enhanced website data with PDF support loaded and indexed!")
+        print(f"📊 Final Database Stats:")
+        print(f"   🌐 Web pages scraped: {stats['web_pages']}")
+        print(f"   📄 PDF files processed: {stats['pdf_files']}")
+        print(f"   ♻️ Sources unchanged since last build: {planner.unchanged_sources}")
+        print(f"   🧩 New document chunks: {stats['embedded']}")
+        print(f"   🧠 Embeddings created: {stats['embedded']}")
+        print(f"   💾 Vector database size: {vectordb.index.ntotal} vectors")
+        print(f"   📊 New web content chunks: {stats['web_chunks']}")
+        print(f"   📊 New PDF content chunks: {stats['pdf_chunks']}")
+        
+    except Exception as e:
+        print(f"❌ Error creating vector database: {e}")
+        print(f"   ⏯️ Progress is saved in {checkpoint.run_dir} - run again with the same settings to resume")
+        return
+    
+    finally:
+        pipeline.stop()
+        embeddings_model.print_summary()
+        evicted = embeddings_model.evict()
+        if evicted:
+            print(f"   🧹 Evicted {evicted} least recently used vectors")
 
 if __name__ == "__main__":
     # URL Variables - Control which website to scrape
@@ -599,6 +1049,15 @@ if __name__ == "__main__":
     # PDF Processing limits
     max_pdfs = 150  # Number of PDFs to process (reduced for better reliability)
     
+    # Concurrent requests while crawling - the per-host rate limit from robots.txt still applies
+    crawl_concurrency = CRAWL_CONCURRENCY
+    
+    # Incremental rebuild - only re-embed pages and PDFs that changed since the last build
+    incremental = True
+    
+    # Resume an interrupted run with the same settings from its checkpoint
+    resume = True
+    
     # Recommended settings:
     # max_pages = 5   # Very safe - good for testing
     # max_pages = 15  # Moderate - good balance
@@ -615,7 +1074,10 @@ if __name__ == "__main__":
     print(f"🎯 Target: {base_url}")
     print(f"🛡️ Max pages to scrape: {max_pages}")
     print(f"📄 Max PDFs to process: {max_pdfs}")
-    print(f"⏱️ Delay between requests: 2.5 seconds")
+    print(f"🔁 Incremental update: {'on' if incremental else 'off (full rebuild)'}")
+    print(f"⏯️ Resume interrupted runs: {'on' if resume else 'off'}")
+    print(f"⚡ Concurrent requests: {crawl_concurrency}")
+    print(f"⏱️ Delay between requests per host: robots.txt Crawl-delay (default {DEFAULT_CRAWL_DELAY} seconds)")
     print(f"⏰ Timeout per page: 10 seconds")
     print()
     
@@ -628,4 +1090,4 @@ if __name__ == "__main__":
             print("❌ Processing cancelled for safety.")
             exit()
     
-    load_and_process_website(base_url, max_pages, max_pdfs)
\ No newline at end of file
+    load_and_process_website(base_url, max_pages, max_pdfs, crawl_concurrency, incremental, resume)
\ No newline at end of file
@@ -2,7 +2,6 @@ from langchain_community.document_loaders import WebBaseLoader
 from langchain.text_splitter import CharacterTextSplitter
 from dotenv import load_dotenv, find_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_openai import ChatOpenAI
 from langchain import hub
 from langchain_core.output_parsers import StrOutputParser
@@ -250,14 +249,21 @@ if not OPENAI_API_KEY or OPENAI_API_KEY == "your-openai-api-key-here":
 
 # Path to the prebuilt FAISS index - handle both running from root and Source directory
 import os
+from index_versions import IndexReloader, current_index_path, read_version_info, INDEX_ROOT
+from ann_index import apply_search_params, attach_reranking, index_kind
+from matryoshka import truncated_embeddings
+from index_storage import open_index
+
+RETRIEVER_K = 8  # Chunks retrieved per question
+INDEX_SEARCH_PARAMS = {}  # Overrides for the index's search parameters, e.g. {"nprobe": 32} (IVF) or {"efSearch": 128} (HNSW)
 
 def get_vector_db_path():
-    """Get the correct path to the vector database regardless of working directory"""
+    """Get the correct path to the index root (published versions, or a legacy unversioned index) regardless of working directory"""
     print(f"🔍 Current working directory: {os.getcwd()}")
     print(f"🔍 Files in current directory: {os.listdir('.')}")
     
     possible_paths = [
-        "index.faiss",           # Primary: Root directory (preferred)
+        INDEX_ROOT,              # Primary: Root directory (preferred)
         "./index.faiss",         # Explicit current directory
         "../index.faiss",        # When running from subdirectory
         "Source/index.faiss",    # Legacy: Source directory (fallback)
@@ -270,17 +276,13 @@ def get_vector_db_path():
             abs_path = os.path.abspath(path)
             print(f"✅ Found vector database at: {path} (absolute: {abs_path})")
             
-            # Check if the required files exist
-            faiss_file = os.path.join(path, "index.faiss")
-            pkl_file = os.path.join(path, "index.pkl")
-            print(f"🔍 FAISS file exists: {os.path.exists(faiss_file)} ({faiss_file})")
-            print(f"🔍 PKL file exists: {os.path.exists(pkl_file)} ({pkl_file})")
-            
-            if os.path.exists(faiss_file) and os.path.exists(pkl_file):
-                print(f"✅ Both database files found!")
+            # Check that a published version (or an unversioned index) is there
+            live_path = current_index_path(path)
+            if live_path is not None:
+                print(f"✅ Live index: {live_path}")
                 return path
             else:
-                print(f"⚠️ Database directory found but missing files")
+                print(f"⚠️ Database directory found but no published index in it")
     
     # If none found, show detailed error
     print("❌ Vector database not found in any expected locations")
@@ -288,39 +290,55 @@ def get_vector_db_path():
     for path in possible_paths:
         print(f"   - {path} (exists: {os.path.exists(path)})")
     
-    return "index.faiss"  # Default fallback
+    return INDEX_ROOT  # Default fallback
 
 index_Faiss_Filepath = get_vector_db_path()
 
+def load_vector_database(path):
+    """
+    Load one index version from local disk, with the embedding model it was built with.
+    Called once at startup and again in the background whenever a new version is published.
+    """
+    print(f"🔄 Attempting to load vector database from: {path}")
+    version_info = read_version_info(path)
+    embedding_model = version_info.get('embedding_model', "text-embedding-3-small")
+    
+    # Questions are embedded like the chunks were - truncated if the index stores shortened vectors.
+    # The index is memory-mapped and chunk text is read from SQLite per hit, nothing is unpickled
+    db = open_index(
+        path, 
+        truncated_embeddings(
+            OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=embedding_model),
+            version_info.get('embedding_dimensions')
+        )
+    )
+    # A quantized index re-ranks its candidates with the float32 vectors saved beside it
+    attach_reranking(db, path)
+    
+    # Verify the database loaded correctly
+    vector_count = db.index.ntotal if hasattr(db, 'index') else 0
+    print(f"✅ Vector database loaded successfully!")
+    print(f"📊 Vector count: {vector_count}")
+    
+    # Test a simple search to verify functionality
+    if vector_count > 0:
+        test_results = db.similarity_search("Westlake High School", k=1)
+        print(f"🔍 Test search returned {len(test_results)} results")
+        if test_results:
+            print(f"📄 Sample result length: {len(test_results[0].page_content)} characters")
+    
+    return db
+
 @st.cache_resource
-def load_vector_database():
+def get_index_reloader():
     """
-    Load the Vector Database from local disk with caching for better performance.
+    Load the live index once per server and keep watching for newly published versions.
     This expensive operation only runs once and gets cached.
     """
     try:
-        print(f"🔄 Attempting to load vector database from: {index_Faiss_Filepath}")
-        
-        db = FAISS.load_local(
-            index_Faiss_Filepath, 
-            OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model="text-embedding-3-small"), 
-            allow_dangerous_deserialization=True
-        )
-        
-        # Verify the database loaded correctly
-        vector_count = db.index.ntotal if hasattr(db, 'index') else 0
-        print(f"✅ Vector database loaded successfully!")
-        print(f"📊 Vector count: {vector_count}")
-        
-        # Test a simple search to verify functionality
-        if vector_count > 0:
-            test_results = db.similarity_search("Westlake High School", k=1)
-            print(f"🔍 Test search returned {len(test_results)} results")
-            if test_results:
-                print(f"📄 Sample result length: {len(test_results[0].page_content)} characters")
-        
-        return db
-        
+        reloader = IndexReloader(index_Faiss_Filepath, load_vector_database)
+        reloader.watch()
+        return reloader
     except Exception as e:
         print(f"❌ Error loading vector database: {e}")
         print(f"🔍 Error type: {type(e).__name__}")
@@ -332,14 +350,16 @@ def load_vector_database():
         # Return None or raise the error
         raise e
 
-# Load the cached vector database
+# Load the cached vector database - a newly published version is loaded in the background
+# and swapped in for the questions asked after it is ready
 try:
-    db = load_vector_database()
+    index_reloader = get_index_reloader()
+    index_version, db = index_reloader.current()
     vector_count = db.index.ntotal if hasattr(db, 'index') else 0
-    print(f"🎉 Database loaded with {vector_count} vectors")
+    print(f"🎉 Database version {index_version} loaded with {vector_count} vectors")
 except Exception as e:
     print(f"💥 Database loading failed: {e}")
-    db = None
+    index_version, db = None, None
 
 
 #Perform Sementic Search Of the Embeddings inside with the database you loaded --^
@@ -354,19 +374,27 @@ def initialize_llm():
     """
     return ChatOpenAI(openai_api_key=OPENAI_API_KEY, model="gpt-3.5-turbo-0125")
 
-@st.cache_resource
-def get_retriever(_db):
+@st.cache_resource(max_entries=2)
+def get_retriever(_db, version, search_params=None):
     """
     Create retriever from the vector database with caching.
-    The underscore prefix in _db tells Streamlit not to hash this parameter.
+    The underscore prefix in _db tells Streamlit not to hash this parameter;
+    the index version keys the cache instead.
     """
-    return _db.as_retriever(search_type="similarity", search_kwargs={"k": 8})
+    # IVF and HNSW indexes trade recall for speed through their search parameters
+    params = apply_search_params(_db.index, search_params)
+    if params:
+        print(f"🔧 {index_kind(_db.index).upper()} search parameters: {params}")
+    return _db.as_retriever(search_type="similarity", search_kwargs={"k": RETRIEVER_K})
 
-@st.cache_resource
-def get_lazy_components():
-    """Lazy load heavy components only when needed for better startup performance"""
+@st.cache_resource(max_entries=2)
+def get_lazy_components(_db, version):
+    """
+    Lazy load heavy components only when needed for better startup performance.
+    A new index version gets new components; answers already in progress keep the old ones.
+    """
     llm = initialize_llm()
-    retriever = get_retriever(db)
+    retriever = get_retriever(_db, version, INDEX_SEARCH_PARAMS)
     prompt = get_rag_prompt()
     rag_chain = create_rag_chain(llm, retriever, prompt)
     return {
@@ -483,7 +511,7 @@ def get_connection_pool():
 
 def robust_ai_call(user_input, max_retries=3):
     """Enhanced AI call with abbreviation expansion and unknown term detection"""
-    components = get_lazy_components()  # Load components when needed
+    components = get_lazy_components(db, index_version)  # Load components when needed
     
     # Step 1: Check for unknown abbreviations first
     unknown_abbrevs = detect_unknown_abbreviations(user_input)
@@ -1282,6 +1310,7 @@ def main():
                 <div class="sidebar-info">
                     <h3>📊 Database Status</h3>
                     <p>✅ Loaded: {vector_count:,} vectors</p>
+                    <p>🏷️ Index version: {html.escape(str(index_version))}</p>
                     <p>📄 School data ready</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -0,0 +1,267 @@
+"""
+Approximate nearest neighbour index types for the published vector index.
+
+Ingestion always maintains a flat (exhaustive) index, because changed
+sources need their old vectors deleted and HNSW graphs cannot delete. When
+a build is published, the flat index is converted to the configured
+INDEX_TYPE:
+
+  flat - exact search, cost grows linearly with the number of vectors
+  ivf  - vectors are bucketed under k-means centroids trained on the data;
+         a query scans only the nprobe closest buckets
+  hnsw - a navigable small-world graph; a query walks it keeping efSearch
+         candidates
+
+The next incremental build converts the published index back to flat
+before updating it. benchmark_index_types.py measures recall@8 and query
+latency of each type so the type and its search parameters can be chosen
+for the size of a deployment.
+
+Any type can also store its vectors compressed (QUANTIZATION): float16
+(half the memory), int8 scalar quantization (a quarter) or product
+quantization (PQ, 16 dimensions per byte - 1/64th). The float32 vectors
+are then kept in a .npy file beside the index instead of in memory; a
+query fetches k * RERANK_FACTOR candidates from the compressed index and
+re-ranks them by exact distance, reading only those rows from disk.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = "flat"  # Index built at publish time: "flat", "ivf" or "hnsw"
+IVF_NLIST = None  # IVF buckets; None picks ~4 * sqrt(vectors)
+IVF_MIN_POINTS_PER_LIST = 39  # Fewer training vectors per bucket than this gives poor centroids
+HNSW_M = 32  # Graph neighbours per vector
+HNSW_EF_CONSTRUCTION = 200  # Candidate list size while building the graph
+QUANTIZATION = None  # Vector encoding in the index: None (float32), "fp16", "sq8" or "pq"
+PQ_SUBVECTOR_DIMS = 16  # Dimensions encoded per PQ byte
+PQ_MIN_TRAINING_POINTS = 39 * 256  # Vectors needed to train PQ codebooks; fewer fall back to sq8
+RERANK_FACTOR = 4  # Candidates fetched from a quantized index per result, re-ranked exactly
+RERANK_VECTORS_FILE = "vectors.npy"  # float32 vectors beside a quantized index
+QUALITY_SAMPLE_QUERIES = 200  # Stored vectors used as queries to measure recall loss at publish time
+
+# Search parameters used by the assistant unless it overrides them
+DEFAULT_SEARCH_PARAMS = {
+    'flat': {},
+    'ivf': {'nprobe': 16},  # Buckets scanned per query
+    'hnsw': {'efSearch': 64},  # Candidates kept while walking the graph
+}
+INDEX_TYPES = tuple(DEFAULT_SEARCH_PARAMS)
+SCALAR_QUANTIZERS = {
+    'fp16': faiss.ScalarQuantizer.QT_fp16,
+    'sq8': faiss.ScalarQuantizer.QT_8bit,
+}
+QUANTIZATIONS = (None, 'pq') + tuple(SCALAR_QUANTIZERS)
+
+
+class RerankingIndex:
+    """
+    A quantized FAISS index whose candidates are re-ranked by exact L2 distance
+    against the float32 vectors (a read-only memmap, so only fetched rows are read).
+    Anything but search() is passed through to the wrapped index.
+    """
+
+    def __init__(self, index, vectors, factor=RERANK_FACTOR):
+        self.index = index
+        self.vectors = vectors
+        self.factor = factor
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def search(self, queries, k):
+        candidates = min(self.index.ntotal, k * self.factor)
+        _, candidate_ids = self.index.search(queries, candidates)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, row_ids) in enumerate(zip(queries, candidate_ids)):
+            row_ids = np.sort(row_ids[row_ids >= 0])  # Ascending ids read the file front to back
+            exact = ((np.asarray(self.vectors[row_ids]) - query) ** 2).sum(axis=1)
+            best = np.argsort(exact)[:k]
+            distances[row, :len(best)] = exact[best]
+            ids[row, :len(best)] = row_ids[best]
+        return distances, ids
+
+
+def unwrap(index):
+    """The FAISS index inside a RerankingIndex"""
+    return index.index if isinstance(index, RerankingIndex) else index
+
+
+def index_kind(index):
+    """'flat', 'ivf' or 'hnsw' for a FAISS index"""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if faiss.try_extract_index_ivf(index) is not None:
+        return 'ivf'
+    return 'flat'
+
+
+def ivf_nlist(num_vectors, nlist=IVF_NLIST):
+    """Bucket count for IVF - capped so every bucket gets enough training vectors"""
+    if nlist is None:
+        nlist = int(4 * math.sqrt(num_vectors))
+    return min(nlist, num_vectors // IVF_MIN_POINTS_PER_LIST)
+
+
+def pq_subquantizers(dimension):
+    """PQ bytes per vector - about one per PQ_SUBVECTOR_DIMS dimensions, dividing the dimension evenly"""
+    m = max(1, dimension // PQ_SUBVECTOR_DIMS)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def build_index(vectors, index_type=INDEX_TYPE, quantization=QUANTIZATION, nlist=IVF_NLIST,
+                hnsw_m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION):
+    """
+    Build an L2 index of the given type and vector encoding over a float32 array of vectors, in row order.
+    Returns (index, params) - params records how it was built for the version manifest.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"unknown index type '{index_type}' - choose one of {', '.join(INDEX_TYPES)}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"unknown quantization '{quantization}' - choose one of {', '.join(map(str, QUANTIZATIONS))}")
+    num_vectors, dimension = vectors.shape
+
+    if quantization == 'pq' and num_vectors < PQ_MIN_TRAINING_POINTS:
+        print(f"   ℹ️ {num_vectors} vectors are too few to train PQ codebooks - using sq8")
+        quantization = 'sq8'
+    pq_m = pq_subquantizers(dimension)
+    qtype = SCALAR_QUANTIZERS.get(quantization)
+    params = {'type': index_type, 'quantization': quantization}
+    if quantization == 'pq':
+        params['pq_m'] = pq_m
+
+    if index_type == 'ivf':
+        nlist = ivf_nlist(num_vectors, nlist)
+        if nlist < 2:
+            print(f"   ℹ️ {num_vectors} vectors are too few to train IVF buckets - building a flat index")
+            index_type = params['type'] = 'flat'
+        else:
+            quantizer = faiss.IndexFlatL2(dimension)
+            if quantization == 'pq':
+                index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8)
+            elif qtype is not None:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, faiss.METRIC_L2)
+            else:
+                index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+            params['nlist'] = nlist
+
+    if index_type == 'hnsw':
+        if quantization == 'pq':
+            index = faiss.IndexHNSWPQ(dimension, pq_m, hnsw_m)
+        elif qtype is not None:
+            index = faiss.IndexHNSWSQ(dimension, qtype, hnsw_m)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        params.update(M=hnsw_m, efConstruction=ef_construction)
+
+    if index_type == 'flat':
+        if quantization == 'pq':
+            index = faiss.IndexPQ(dimension, pq_m, 8)
+        elif qtype is not None:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexFlatL2(dimension)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index, params
+
+
+def bytes_per_vector(index):
+    """Serialized size of an index per vector - what a replica holds in memory for it"""
+    return faiss.serialize_index(unwrap(index)).nbytes / max(unwrap(index).ntotal, 1)
+
+
+def recall_at_k(ids, truth):
+    """Share of the exact top-k found, averaged over queries"""
+    return np.mean([len(set(row) & set(true_row)) / len(true_row) for row, true_row in zip(ids, truth)])
+
+
+def measure_recall(vectors, index, k=8, num_queries=QUALITY_SAMPLE_QUERIES):
+    """
+    Recall@k of an index against exact search, without and with exact re-ranking,
+    using a sample of the stored vectors as queries
+    """
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    _, approximate = index.search(queries, k)
+    _, reranked = RerankingIndex(index, vectors).search(queries, k)
+    return recall_at_k(approximate, truth), recall_at_k(reranked, truth)
+
+
+def index_vectors(index):
+    """All stored vectors of an index as a float32 array, in index order"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()  # IVF lists are unordered; reconstruct needs the id -> list map
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def convert_index(vectordb, index_type=INDEX_TYPE, quantization=QUANTIZATION):
+    """
+    Replace a vector store's index with one of another type, keeping vector order
+    (so index_to_docstore_id stays valid). Returns (params, float32 vectors).
+    """
+    vectors = index_vectors(vectordb.index)
+    vectordb.index, params = build_index(vectors, index_type, quantization)
+    return params, vectors
+
+
+def save_rerank_vectors(path, vectors):
+    """Keep the float32 vectors beside a quantized index for exact re-ranking"""
+    np.save(os.path.join(path, RERANK_VECTORS_FILE), np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def load_rerank_vectors(path):
+    """The float32 vectors of an index directory, memory-mapped - or None"""
+    vectors_path = os.path.join(path, RERANK_VECTORS_FILE)
+    if not os.path.exists(vectors_path):
+        return None
+    return np.load(vectors_path, mmap_mode='r')
+
+
+def attach_reranking(vectordb, path, factor=RERANK_FACTOR):
+    """Re-rank the results of a quantized index exactly, if its float32 vectors were saved with it"""
+    vectors = load_rerank_vectors(path)
+    if vectors is not None and not isinstance(vectordb.index, faiss.IndexFlat):
+        vectordb.index = RerankingIndex(vectordb.index, vectors, factor)
+    return vectordb
+
+
+def to_flat(vectordb, path=None):
+    """
+    Convert a loaded published index back to an exact flat one so it can be updated
+    incrementally - from the saved float32 vectors when there are any, as quantized
+    vectors only approximate them
+    """
+    vectors = load_rerank_vectors(path) if path else None
+    if vectors is not None and len(vectors) == vectordb.index.ntotal:
+        vectordb.index = faiss.IndexFlatL2(vectors.shape[1])
+        vectordb.index.add(np.ascontiguousarray(vectors))
+    elif not isinstance(vectordb.index, faiss.IndexFlatL2):
+        vectordb.index, _ = build_index(index_vectors(vectordb.index), 'flat', None)
+    return vectordb
+
+
+def apply_search_params(index, overrides=None):
+    """Set the search parameters of an index's type (defaults, then overrides); returns what was set"""
+    kind = index_kind(index)
+    params = dict(DEFAULT_SEARCH_PARAMS[kind], **{
+        name: value for name, value in (overrides or {}).items() if name in DEFAULT_SEARCH_PARAMS[kind]
+    })
+    parameter_space = faiss.ParameterSpace()
+    for name, value in params.items():
+        parameter_space.set_index_parameter(unwrap(index), name, value)
+    return params
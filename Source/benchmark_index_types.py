@@ -0,0 +1,156 @@
+"""
+Recall / latency / memory benchmark of the index types in ann_index.py.
+
+Takes the vectors of the published index (or random unit vectors when
+there is none), holds a sample out as queries, and builds each index type
+over the rest. Every configuration - flat, IVF at several nprobe values,
+HNSW at several efSearch values, and the quantized encodings at the default
+search parameters - is measured on recall@8 against exact flat search, on
+single-query p50/p99 latency (which is how the assistant searches) and on
+bytes per vector. Quantized indexes re-rank their candidates with the
+float32 vectors, as the assistant does.
+
+To see how the types behave at a larger deployment, pass a vector count:
+the published vectors are resampled with a little noise up to that size.
+
+    python Source/benchmark_index_types.py            # the published index as it is
+    python Source/benchmark_index_types.py 500000     # simulated 500k-vector deployment
+"""
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import (
+    DEFAULT_SEARCH_PARAMS, RerankingIndex, build_index, bytes_per_vector, index_vectors, ivf_nlist, load_rerank_vectors,
+    recall_at_k, unwrap
+)
+from index_versions import INDEX_ROOT, current_index_path
+
+RECALL_K = 8  # The assistant's retriever k
+BENCHMARK_QUERIES = 500  # Held-out vectors used as queries
+IVF_NPROBES = (1, 4, 16, 64)
+HNSW_EF_SEARCHES = (16, 32, 64, 128)
+# (index type, quantization, search parameter, values) - quantized indexes at the default parameter only
+BENCHMARK_CONFIGS = (
+    ('flat', None, None, (None,)),
+    ('ivf', None, 'nprobe', IVF_NPROBES),
+    ('hnsw', None, 'efSearch', HNSW_EF_SEARCHES),
+    ('flat', 'fp16', None, (None,)),
+    ('flat', 'sq8', None, (None,)),
+    ('flat', 'pq', None, (None,)),
+    ('ivf', 'sq8', 'nprobe', (DEFAULT_SEARCH_PARAMS['ivf']['nprobe'],)),
+    ('ivf', 'pq', 'nprobe', (DEFAULT_SEARCH_PARAMS['ivf']['nprobe'],)),
+    ('hnsw', 'sq8', 'efSearch', (DEFAULT_SEARCH_PARAMS['hnsw']['efSearch'],)),
+)
+RANDOM_DIMENSION = 1536  # Dimension of the random vectors used without an index
+RESAMPLE_NOISE = 0.05  # Noise added to resampled copies, relative to a unit vector
+
+
+def load_vectors(root=INDEX_ROOT):
+    """
+    float32 vectors of the published index, or None - from vectors.npy if it is
+    quantized, as its codes only approximate the vectors
+    """
+    path = current_index_path(root)
+    if path is None:
+        return None
+    vectors = load_rerank_vectors(path)
+    if vectors is not None:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.read_index(f"{path}/index.faiss")
+    return index_vectors(index)
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def resample(vectors, size, noise=RESAMPLE_NOISE, seed=0):
+    """Grow a vector set to size rows with noisy copies, keeping its cluster structure"""
+    if size <= len(vectors):
+        return vectors[:size]
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vectors), size - len(vectors))
+    copies = vectors[picks] + rng.normal(0, noise / np.sqrt(vectors.shape[1]), (len(picks), vectors.shape[1]))
+    return np.vstack([vectors, normalize(copies).astype(np.float32)])
+
+
+def search_latencies(index, queries, k=RECALL_K):
+    """Search one query at a time; returns (ids, latencies in ms)"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids[i] = index.search(queries[i:i + 1], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return ids, latencies
+
+
+def run_benchmark(vectors, num_queries=BENCHMARK_QUERIES):
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    num_queries = min(num_queries, len(vectors) // 10)
+    queries = np.ascontiguousarray(vectors[order[:num_queries]])
+    base = np.ascontiguousarray(vectors[order[num_queries:]])
+    print(f"📐 {len(base):,} vectors of dimension {base.shape[1]}, {num_queries} held-out queries, recall@{RECALL_K}")
+
+    build_threads = faiss.omp_get_max_threads()
+    results = []
+    truth = None
+    for index_type, quantization, parameter, values in BENCHMARK_CONFIGS:
+        if index_type == 'ivf' and ivf_nlist(len(base)) < 2:
+            print(f"   ℹ️ Too few vectors for IVF - skipped")
+            continue
+        faiss.omp_set_num_threads(build_threads)
+        start = time.perf_counter()
+        index, params = build_index(base, index_type, quantization)
+        build_seconds = time.perf_counter() - start
+        size = bytes_per_vector(index)
+        if params['quantization']:
+            index = RerankingIndex(index, base)
+
+        # Single-query searches, as in the assistant - extra threads only add overhead
+        faiss.omp_set_num_threads(1)
+
+        name = index_type if not params['quantization'] else f"{index_type}+{params['quantization']}"
+        for value in values:
+            label = name if parameter is None else f"{name} {parameter}={value}"
+            if parameter is not None:
+                faiss.ParameterSpace().set_index_parameter(unwrap(index), parameter, value)
+            ids, latencies = search_latencies(index, queries)
+            if truth is None:
+                truth = ids  # Flat search is exact
+            results.append({
+                'label': label,
+                'build_seconds': build_seconds,
+                'bytes': size,
+                'recall': recall_at_k(ids, truth),
+                'p50': np.percentile(latencies, 50),
+                'p99': np.percentile(latencies, 99),
+            })
+        print(f"   🏗️ Built {name} {params} in {build_seconds:.1f}s")
+
+    print(f"\n📊 Index Type Benchmark:")
+    print(f"   {'index':<26} {'build s':>8} {'bytes/vec':>10} {'recall@' + str(RECALL_K):>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"   {result['label']:<26} {result['build_seconds']:>8.1f} {result['bytes']:>10,.0f} {result['recall']:>9.3f} "
+              f"{result['p50']:>8.3f} {result['p99']:>8.3f}")
+    return results
+
+
+if __name__ == "__main__":
+    vectors = load_vectors()
+    if vectors is None:
+        print(f"ℹ️ No published index in {INDEX_ROOT} - using random unit vectors")
+        vectors = normalize(np.random.default_rng(0).normal(size=(10000, RANDOM_DIMENSION))).astype(np.float32)
+
+    if len(sys.argv) > 1:
+        vectors = resample(vectors, int(sys.argv[1]))
+
+    if len(vectors) < 100:
+        print(f"❌ Only {len(vectors)} vectors - too few to benchmark; pass a vector count to simulate a larger index")
+        sys.exit(1)
+
+    run_benchmark(vectors)
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for page parsing: BeautifulSoup's html.parser vs lxml.
+
+Runs both parser paths of parse_page over saved pages - by default the HTML
+bodies the loader kept in its HTTP cache during the last crawl, or every
+.html file in a directory given on the command line - and reports parse
+throughput and whether both paths extracted the same text and links.
+
+    python Source/1_LoadWebsiteData.py           # crawl once to fill .http_cache
+    python Source/benchmark_page_parser.py       # or: ... benchmark_page_parser.py saved_pages/
+"""
+import glob
+import json
+import os
+import sys
+import time
+
+from boilerplate import text_blocks
+from http_cache import HTTP_CACHE_DIR
+from page_parser import parse_page, lxml
+
+BENCHMARK_ROUNDS = 5  # Passes over the page set per parser; the fastest pass is reported
+
+
+def load_cached_pages(cache_dir=HTTP_CACHE_DIR):
+    """(url, body) of every HTML page stored by the loader's HTTP cache"""
+    pages = []
+    for entry_path in sorted(glob.glob(os.path.join(cache_dir, "*.json"))):
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(entry_path[:-len("json")] + "body", 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            continue
+        if b'<html' in body[:2048].lower():
+            pages.append((entry['url'], body))
+    return pages
+
+
+def load_html_files(directory):
+    """(file URL, body) of every .html file in a directory"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.htm*"), recursive=True)):
+        with open(path, 'rb') as f:
+            pages.append((f"file://{os.path.abspath(path)}", f.read()))
+    return pages
+
+
+def time_parser(pages, parser, rounds=BENCHMARK_ROUNDS):
+    """Fastest of several passes over all pages, in seconds"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for url, body in pages:
+            parse_page(url, body, url, parser=parser)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_output(pages):
+    """Pages where the two parsers disagree on text blocks, links or PDF links"""
+    mismatches = []
+    for url, body in pages:
+        soup_page = parse_page(url, body, url, parser="html.parser")
+        lxml_page = parse_page(url, body, url, parser="lxml")
+        if (text_blocks(soup_page.document.page_content) != text_blocks(lxml_page.document.page_content)
+                or soup_page.links != lxml_page.links
+                or soup_page.pdf_links != lxml_page.pdf_links):
+            mismatches.append(url)
+    return mismatches
+
+
+def run_benchmark(pages, rounds=BENCHMARK_ROUNDS):
+    total_bytes = sum(len(body) for _, body in pages)
+    print(f"📄 {len(pages)} pages, {total_bytes / 1024 / 1024:.1f}MB of HTML, best of {rounds} rounds")
+
+    results = {}
+    for parser in ("html.parser", "lxml"):
+        seconds = time_parser(pages, parser, rounds)
+        results[parser] = seconds
+        print(f"   ⏱️ {parser:<12} {seconds * 1000 / len(pages):7.2f} ms/page   {len(pages) / seconds:8.1f} pages/s")
+
+    print(f"   🚀 lxml speedup: {results['html.parser'] / results['lxml']:.1f}x")
+
+    mismatches = compare_output(pages)
+    if mismatches:
+        print(f"   ⚠️ Output differs on {len(mismatches)} pages, e.g. {mismatches[0]}")
+    else:
+        print(f"   ✅ Both parsers extracted the same text blocks and links on every page")
+    return results
+
+
+if __name__ == "__main__":
+    if lxml is None:
+        print("❌ lxml is not installed - pip install lxml")
+        sys.exit(1)
+
+    if len(sys.argv) > 1:
+        pages = load_html_files(sys.argv[1])
+    else:
+        pages = load_cached_pages()
+
+    if not pages:
+        print(f"❌ No saved pages found - crawl once with 1_LoadWebsiteData.py, or pass a directory of .html files")
+        sys.exit(1)
+
+    run_benchmark(pages)
@@ -0,0 +1,139 @@
+"""
+Benchmark of the PDF text extraction backends.
+
+Every installed backend in PDF_EXTRACTORS extracts a corpus of PDFs - by
+default the PDFs the loader kept in its HTTP cache during the last crawl, or
+every PDF in a directory given on the command line. Each backend runs in a
+fresh process so its memory use can be measured on its own. The report
+shows pages per second, peak memory growth, and the characters and pages
+with text each backend recovered, then recommends the fastest backend whose
+text yield is close to the best one.
+
+    python Source/benchmark_pdf_extractors.py                 # PDFs from .http_cache
+    python Source/benchmark_pdf_extractors.py school_pdfs/    # a local corpus
+"""
+import glob
+import multiprocessing
+import os
+import sys
+import time
+
+from http_cache import HTTP_CACHE_DIR
+from pdf_extraction import PDF_EXTRACTORS, available_extractors, iter_pdf_pages
+
+try:
+    import resource
+except ImportError:  # Windows - memory is not reported
+    resource = None
+
+ACCEPTABLE_YIELD = 0.95  # Share of the best backend's characters a recommended backend must reach
+
+
+def find_pdfs(directory=None):
+    """Paths of the PDFs to benchmark"""
+    if directory:
+        return sorted(glob.glob(os.path.join(directory, "**", "*.pdf"), recursive=True))
+
+    paths = []
+    for path in sorted(glob.glob(os.path.join(HTTP_CACHE_DIR, "*.body"))):
+        with open(path, 'rb') as f:
+            if f.read(5) == b'%PDF-':
+                paths.append(path)
+    return paths
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _benchmark_worker(conn, extractor, pdf_paths):
+    """Extract every PDF with one backend in this process and send back the totals"""
+    # Import the backend first so its import cost is not counted as extraction memory
+    _, module = PDF_EXTRACTORS[extractor]
+    __import__(module)
+    memory_before = peak_memory_mb()
+
+    result = {'pages': 0, 'text_pages': 0, 'chars': 0, 'errors': 0, 'failed_pdfs': 0}
+    start = time.perf_counter()
+    for pdf_path in pdf_paths:
+        try:
+            for _, _, text, error in iter_pdf_pages(pdf_path, extractor):
+                result['pages'] += 1
+                if error is not None:
+                    result['errors'] += 1
+                elif text and text.strip():
+                    result['text_pages'] += 1
+                    result['chars'] += len(text.strip())
+        except Exception:
+            result['failed_pdfs'] += 1
+    result['seconds'] = time.perf_counter() - start
+
+    memory_after = peak_memory_mb()
+    result['memory_mb'] = memory_after - memory_before if memory_before is not None else None
+    conn.send(result)
+    conn.close()
+
+
+def benchmark_extractor(extractor, pdf_paths):
+    """Run one backend over the corpus in a fresh process"""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_benchmark_worker, args=(child_conn, extractor, pdf_paths))
+    process.start()
+    child_conn.close()
+    try:
+        return parent_conn.recv()
+    except EOFError:
+        return None
+    finally:
+        process.join()
+
+
+def run_benchmark(pdf_paths, extractors=None):
+    extractors = extractors or available_extractors()
+    total_mb = sum(os.path.getsize(path) for path in pdf_paths) / 1024 / 1024
+    print(f"📚 {len(pdf_paths)} PDFs ({total_mb:.1f}MB), backends: {', '.join(extractors)}")
+    missing = [name for name in PDF_EXTRACTORS if name not in extractors]
+    if missing:
+        print(f"   ℹ️ Not installed (skipped): {', '.join(missing)}")
+
+    results = {}
+    for extractor in extractors:
+        print(f"   ⏱️ Extracting with {extractor}...")
+        result = benchmark_extractor(extractor, pdf_paths)
+        if result is None:
+            print(f"   ❌ {extractor}: benchmark process crashed")
+            continue
+        results[extractor] = result
+
+    if not results:
+        return results
+
+    best_chars = max(result['chars'] for result in results.values()) or 1
+    print(f"\n📊 PDF Extractor Benchmark:")
+    print(f"   {'backend':<10} {'pages/s':>9} {'peak MB':>8} {'chars':>11} {'yield':>6} {'text pages':>11} {'errors':>7}")
+    for extractor, result in results.items():
+        pages_per_second = result['pages'] / result['seconds'] if result['seconds'] else 0.0
+        memory = f"{result['memory_mb']:.1f}" if result['memory_mb'] is not None else "n/a"
+        print(f"   {extractor:<10} {pages_per_second:>9.1f} {memory:>8} {result['chars']:>11,} "
+              f"{result['chars'] / best_chars:>6.0%} {result['text_pages']:>5}/{result['pages']:<5} "
+              f"{result['errors'] + result['failed_pdfs']:>7}")
+
+    # The fastest backend that recovers nearly as much text as the best one
+    acceptable = [name for name, result in results.items() if result['chars'] >= ACCEPTABLE_YIELD * best_chars]
+    fastest = min(acceptable, key=lambda name: results[name]['seconds'] / max(results[name]['pages'], 1))
+    print(f"\n   🏆 Recommended: PDF_EXTRACTOR = \"{fastest}\" (fastest with at least {ACCEPTABLE_YIELD:.0%} of the best text yield)")
+    return results
+
+
+if __name__ == "__main__":
+    pdf_paths = find_pdfs(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not pdf_paths:
+        print(f"❌ No PDFs found - crawl once with 1_LoadWebsiteData.py, or pass a directory of PDFs")
+        sys.exit(1)
+
+    run_benchmark(pdf_paths)
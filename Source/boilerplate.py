@@ -0,0 +1,79 @@
+"""
+Site-wide template removal for crawled pages.
+
+Navigation menus, headers and footers repeat on every page of the site, so
+without this step each copy is chunked, embedded and retrieved again. The
+filter learns which text blocks (lines of page text) occur on a large share
+of the crawled pages and removes them before the pages are split, keeping
+only each page's main content.
+"""
+import hashlib
+import re
+from collections import Counter
+
+from langchain.schema import Document
+
+BOILERPLATE_MIN_FRACTION = 0.5  # Blocks on at least this share of pages are treated as template
+BOILERPLATE_MIN_PAGES = 5  # Don't learn a template from fewer pages than this
+BOILERPLATE_SAMPLE_PAGES = 30  # Pages the streaming loader holds back to learn the template from
+
+
+def normalize_block(line):
+    return re.sub(r'\s+', ' ', line).strip()
+
+
+def block_key(block):
+    return hashlib.sha1(block.lower().encode('utf-8')).digest()
+
+
+def text_blocks(text):
+    """Non-empty, whitespace-normalized lines of page text"""
+    blocks = []
+    for line in text.splitlines():
+        block = normalize_block(line)
+        if block:
+            blocks.append(block)
+    return blocks
+
+
+class BoilerplateFilter:
+    """
+    Learns the site template from block frequencies across pages, then strips it
+    """
+
+    def __init__(self, min_fraction=BOILERPLATE_MIN_FRACTION, min_pages=BOILERPLATE_MIN_PAGES):
+        self.min_fraction = min_fraction
+        self.min_pages = min_pages
+        self.template = set()
+        self.chars_before = 0
+        self.chars_after = 0
+
+    def learn(self, documents):
+        """Find the blocks that appear on at least min_fraction of the pages"""
+        self.template = set()
+        if len(documents) < self.min_pages:
+            return self.template
+
+        page_counts = Counter()
+        for doc in documents:
+            page_counts.update({block_key(block) for block in text_blocks(doc.page_content)})
+
+        threshold = max(2, self.min_fraction * len(documents))
+        self.template = {key for key, count in page_counts.items() if count >= threshold}
+        return self.template
+
+    def strip(self, document):
+        """Return a copy of the document with template blocks and blank lines removed"""
+        blocks = [block for block in text_blocks(document.page_content) if block_key(block) not in self.template]
+        text = "\n".join(blocks)
+
+        self.chars_before += len(document.page_content)
+        self.chars_after += len(text)
+        return Document(page_content=text, metadata=dict(document.metadata))
+
+    def print_summary(self):
+        removed = self.chars_before - self.chars_after
+        share = removed / self.chars_before if self.chars_before else 0.0
+        print(f"\n🧹 Template Removal Summary:")
+        print(f"   🧱 Site-wide template blocks learned: {len(self.template)}")
+        print(f"   ✂️ Characters removed: {removed:,} of {self.chars_before:,} ({share:.1%})")
@@ -0,0 +1,145 @@
+"""
+Near-duplicate chunk elimination between splitting and embedding.
+
+Printer-friendly page variants, PDFs that repeat a web page and other
+copies produce chunks that are identical or nearly so. Exact copies are
+found by content hash; near copies with MinHash signatures over word
+shingles, bucketed by locality-sensitive hashing so only likely matches
+are compared. Each group of duplicates is embedded once - the first chunk
+seen is kept and lists every source URL it stands for.
+
+On incremental builds the chunks already in the index are registered
+first (add_existing), so a new or edited source that repeats one of them
+points at the indexed chunk instead of embedding another copy.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity at which chunks count as duplicates
+SHINGLE_WORDS = 5  # Words per shingle
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands of 4 rows - pairs above ~0.5 similarity become candidates
+
+_PRIME = 4294967311  # Smallest prime above 2**32
+_rng = np.random.default_rng(20240501)  # Fixed seed so signatures are stable between runs
+_PERM_A = _rng.integers(1, 2**32 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2**32 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    words = text.split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text):
+    """MinHash signature of a chunk's word shingles"""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+         for shingle in shingles(text)),
+        dtype=np.uint64
+    )
+    # (a*x + b) mod p stays below 2**64 because a, b and x are all 32-bit
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+class ChunkDeduplicator:
+    """
+    Streaming duplicate detection - chunks are checked against every chunk kept so far.
+
+    add() returns None for a chunk that should be embedded, or the ID of the
+    kept chunk it duplicates. sources holds every source URL each kept chunk
+    stands for.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        self._exact = {}  # Hash of normalized text -> kept chunk ID
+        self._digests = {}  # Kept chunk ID -> hash of its normalized text
+        self._buckets = [{} for _ in range(bands)]  # Per band: band hash -> kept chunk IDs
+        self._signatures = {}  # Kept chunk ID -> MinHash signature
+        self.sources = {}  # Kept chunk ID -> source URLs
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _find_near_duplicate(self, signature):
+        checked = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return candidate
+        return None
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _keep(self, chunk_id, digest, signature):
+        self._exact[digest] = chunk_id
+        self._digests[chunk_id] = digest
+        self._signatures[chunk_id] = signature
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, []).append(chunk_id)
+
+    def add_existing(self, chunk, chunk_id):
+        """Register a chunk that is already in the index (from a previous build)"""
+        text = normalize_text(chunk.page_content)
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        if digest in self._exact:
+            return
+        self._keep(chunk_id, digest, minhash_signature(text))
+        # The stored list, so sources added by this build are saved with the chunk
+        self.sources[chunk_id] = chunk.metadata.setdefault('sources', [chunk.metadata.get('source', '')])
+
+    def discard(self, chunk_id):
+        """Stop matching against a kept chunk - its source changed and it is being replaced"""
+        signature = self._signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        digest = self._digests.pop(chunk_id)
+        if self._exact.get(digest) == chunk_id:
+            del self._exact[digest]
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(key)
+            if bucket and chunk_id in bucket:
+                bucket.remove(chunk_id)
+
+    def add(self, chunk, chunk_id):
+        source = chunk.metadata.get('source', '')
+        text = normalize_text(chunk.page_content)
+
+        # Exact duplicates by hash of the normalized text
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        duplicate_of = self._exact.get(digest)
+        if duplicate_of is not None:
+            self.exact_duplicates += 1
+        else:
+            # Near duplicates - LSH buckets give candidates, signatures confirm them
+            signature = minhash_signature(text)
+            duplicate_of = self._find_near_duplicate(signature)
+            if duplicate_of is not None:
+                self.near_duplicates += 1
+            else:
+                self._keep(chunk_id, digest, signature)
+                # A chunk that was discarded and reproduced keeps the sources that pointed at it
+                sources = self.sources.setdefault(chunk_id, [])
+                if source not in sources:
+                    sources.append(source)
+                chunk.metadata['sources'] = sources
+                return None
+
+        if source not in self.sources[duplicate_of]:
+            self.sources[duplicate_of].append(source)
+        return duplicate_of
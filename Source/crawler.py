@@ -0,0 +1,522 @@
+"""
+Polite, concurrent HTTP fetching for the Westlake website loader.
+
+Every request goes through one pooled keep-alive session and a per-host
+token bucket whose rate comes from the host's robots.txt (Crawl-delay or
+Request-rate), so crawl time is bounded by the server's politeness limit
+instead of a fixed sleep after every page. A 429 or 503 answer pauses the
+host's bucket for its Retry-After, and the retry takes a token like any
+other request.
+
+URL discovery starts from robots.txt and sitemap.xml (including sitemap
+indexes), which list the whole site in a handful of requests; link
+following only fills whatever budget the sitemaps leave unused.
+
+URLs are canonicalized before they reach the crawl frontier, so tracking
+parameters, duplicate slashes and host case don't produce duplicate pages,
+and URL patterns that generate endless pages (calendars, pagination) are
+capped.
+"""
+import gzip
+import email.utils
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from urllib import robotparser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Crawler Configuration
+USER_AGENT = "Westlake-Chatbot/1.0"
+CRAWL_CONCURRENCY = 8  # Requests allowed in flight at once
+DEFAULT_CRAWL_DELAY = 2.0  # Seconds between requests to one host when robots.txt gives no limit
+RATE_LIMIT_RETRIES = 2  # Retries of a request answered 429 / 503
+MAX_RETRY_AFTER = 120  # Longest Retry-After honored, in seconds
+REQUEST_TIMEOUT = 10  # Seconds per page request
+ROBOTS_TIMEOUT = 10  # Seconds to wait for robots.txt
+MAX_SITEMAPS = 50  # Sitemap files read per crawl (sitemap indexes can nest)
+
+# Crawler trap limits
+MAX_URL_LENGTH = 300
+MAX_PATH_DEPTH = 10
+MAX_SEGMENT_REPEATS = 2  # e.g. /a/b/a/b/a/b is a relative-link loop
+MAX_URLS_PER_PATTERN = 1000  # Linked URLs that differ only in path numbers or paging/calendar query values
+# Query keys whose values page through an endless space (calendars, listings); other values (IDs) identify content
+PAGING_QUERY_KEYS = re.compile(r'page|^p$|^pg$|offset|^start|^from$|^limit$|date|day|month|year|week|^cal|^view$|^sort|^order')
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref', 'sessionid', 'phpsessid', 'jsessionid', 'sid'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def create_session(pool_size=CRAWL_CONCURRENCY, user_agent=USER_AGENT):
+    """
+    Create a keep-alive session whose connection pool matches the crawl concurrency
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': user_agent})
+
+    # Retry transient server errors with backoff instead of failing the page;
+    # 429 / 503 are retried by PoliteFetcher, through the host's rate limiter
+    retries = Retry(
+        total=2,
+        backoff_factor=1,
+        status_forcelist=[500, 502, 504],
+        allowed_methods=["HEAD", "GET"],
+        respect_retry_after_header=False  # Otherwise urllib3 retries any 429 / 503 that sends Retry-After
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket - each request to a host spends one token
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate  # Tokens added per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then spend it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait_time = self.paused_until - now
+                elif self.rate == float('inf'):
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+
+                    wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def pause(self, seconds):
+        """Hold back every request for the next seconds (the server asked us to slow down)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            # One request as soon as the pause ends, then the normal rate again
+            self.tokens = min(self.tokens, 1)
+            self.updated = self.paused_until
+
+
+def retry_after_seconds(value):
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostPolicy:
+    """
+    robots.txt rules and the request rate limiter for a single host
+    """
+
+    def __init__(self, robots, bucket, delay, sitemaps=None):
+        self.robots = robots
+        self.bucket = bucket
+        self.delay = delay
+        self.sitemaps = sitemaps or []  # Sitemap: lines from robots.txt
+
+    def can_fetch(self, url, user_agent=USER_AGENT):
+        if self.robots is None:
+            return True
+        return self.robots.can_fetch(user_agent, url)
+
+
+class FetchResult:
+    """
+    A fetched page body - either freshly downloaded or revalidated from the HTTP cache
+    """
+
+    def __init__(self, url, status_code, content, headers, not_modified=False, final_url=None):
+        self.url = url
+        self.final_url = final_url or url  # After redirects - relative links resolve against this
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.not_modified = not_modified  # True when the server answered 304
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class PoliteFetcher:
+    """
+    Concurrent fetcher with a shared session and per-host politeness limits
+    """
+
+    def __init__(self, concurrency=CRAWL_CONCURRENCY, default_delay=DEFAULT_CRAWL_DELAY, user_agent=USER_AGENT, cache=None):
+        self.concurrency = concurrency
+        self.cache = cache  # Optional HttpCache for conditional requests
+        self.default_delay = default_delay
+        self.user_agent = user_agent
+        self.session = create_session(concurrency, user_agent)
+        self._policies = {}
+        self._policies_lock = threading.Lock()
+        self._host_locks = {}
+
+    def _load_policy(self, scheme, netloc):
+        """Read robots.txt for a host and build its rate limiter"""
+        robots_url = f"{scheme}://{netloc}/robots.txt"
+        robots = None
+        delay = self.default_delay
+        sitemaps = []
+
+        try:
+            response = self.session.get(robots_url, timeout=ROBOTS_TIMEOUT)
+            if response.status_code == 200:
+                robots = robotparser.RobotFileParser(robots_url)
+                robots.parse(response.text.splitlines())
+
+                crawl_delay = robots.crawl_delay(self.user_agent)
+                request_rate = robots.request_rate(self.user_agent)
+                if crawl_delay:
+                    delay = float(crawl_delay)
+                elif request_rate and request_rate.requests:
+                    delay = request_rate.seconds / request_rate.requests
+                sitemaps = robots.site_maps() or []
+                print(f"🤖 robots.txt for {netloc}: {delay:.2f}s between requests, {len(sitemaps)} sitemaps listed")
+            else:
+                print(f"🤖 No robots.txt for {netloc} (HTTP {response.status_code}), using {delay:.2f}s between requests")
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Could not read {robots_url}: {e}")
+
+        rate = 1.0 / delay if delay > 0 else float('inf')
+        return HostPolicy(robots, TokenBucket(rate), delay, sitemaps)
+
+    def policy_for(self, url):
+        """Get (and lazily create) the politeness policy for a URL's host"""
+        parsed = urlparse(url)
+        netloc = parsed.netloc
+
+        with self._policies_lock:
+            policy = self._policies.get(netloc)
+            if policy is not None:
+                return policy
+            host_lock = self._host_locks.setdefault(netloc, threading.Lock())
+
+        # Only one thread reads robots.txt per host; the others wait for it
+        with host_lock:
+            with self._policies_lock:
+                policy = self._policies.get(netloc)
+            if policy is None:
+                policy = self._load_policy(parsed.scheme or "https", netloc)
+                with self._policies_lock:
+                    self._policies[netloc] = policy
+        return policy
+
+    def can_fetch(self, url):
+        return self.policy_for(url).can_fetch(url, self.user_agent)
+
+    def request(self, method, url, timeout=REQUEST_TIMEOUT, **kwargs):
+        """
+        Send a request once the host's rate limiter allows it. A 429 or 503 pauses
+        the host for its Retry-After (or an exponential backoff) and is retried.
+        """
+        policy = self.policy_for(url)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            policy.bucket.acquire()
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+            if response.status_code not in (429, 503) or attempt == RATE_LIMIT_RETRIES:
+                return response
+
+            wait_time = retry_after_seconds(response.headers.get('Retry-After'))
+            if wait_time is None:
+                wait_time = max(policy.delay, 1.0) * 2 ** attempt
+            wait_time = min(wait_time, MAX_RETRY_AFTER)
+            print(f"⏳ {urlparse(url).netloc} answered {response.status_code} - pausing requests for {wait_time:.0f}s")
+            response.close()
+            policy.bucket.pause(wait_time)
+        return response
+
+    def get(self, url, timeout=REQUEST_TIMEOUT, **kwargs):
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def fetch(self, url, timeout=REQUEST_TIMEOUT, lastmod=None):
+        """
+        GET a URL, revalidating against the HTTP cache when one is configured.
+        If the sitemap's lastmod says the page hasn't changed since we last
+        validated our copy, the cached body is used without any request.
+        """
+        if self.cache is None:
+            response = self.get(url, timeout=timeout)
+            return FetchResult(url, response.status_code, response.content, response.headers, final_url=response.url)
+
+        if lastmod is not None:
+            entry, body = self.cache.fresh_since(url, lastmod)
+            if body is not None:
+                headers = {'Content-Type': entry.get('content_type') or ''}
+                return FetchResult(url, 200, body, headers, not_modified=True, final_url=entry.get('final_url'))
+
+        response = self.get(url, timeout=timeout, headers=self.cache.conditional_headers(url))
+
+        if response.status_code == 304:
+            entry, body = self.cache.revalidated(url, response)
+            if body is not None:
+                headers = {'Content-Type': entry.get('content_type') or ''}
+                return FetchResult(url, 200, body, headers, not_modified=True, final_url=response.url)
+            # Cached body went missing - fall back to a full download
+            response = self.get(url, timeout=timeout)
+
+        if response.status_code == 200:
+            self.cache.store(url, response)
+        return FetchResult(url, response.status_code, response.content, response.headers, final_url=response.url)
+
+    def fetch_many(self, urls, timeout=REQUEST_TIMEOUT):
+        """
+        Fetch URLs concurrently, yielding (url, result, error) as each completes
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.fetch, url, timeout): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    result = future.result()
+                    result.raise_for_status()
+                    yield url, result, None
+                except Exception as e:
+                    yield url, None, e
+
+    def close(self):
+        self.session.close()
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so equivalent addresses compare equal: lowercase scheme
+    and host, no default port or fragment, no duplicate slashes, tracking
+    parameters dropped and the remaining query sorted. A trailing slash is
+    kept - relative links on /dir/ and /dir resolve differently.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r'/{2,}', '/', parsed.path) or '/'
+
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunparse((scheme, host, path, '', urlencode(sorted(query)), ''))
+
+
+def url_pattern(url):
+    """
+    Collapse path numbers and paging / calendar query values so pages from one
+    generator share a pattern. Other query values are kept: on CMSs such as
+    Edlio (index.jsp?uREC_ID=..&pREC_ID=..) they are the page's identity.
+    """
+    parsed = urlparse(url)
+    path = re.sub(r'\d+', '{n}', parsed.path)
+    query = sorted({
+        f"{key}=*" if PAGING_QUERY_KEYS.search(key.lower()) else f"{key}={value}"
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+    })
+    return f"{parsed.netloc}{path}?{'&'.join(query)}"
+
+
+class CrawlFrontier:
+    """
+    FIFO crawl queue over canonical URLs with O(1) duplicate checks and trap detection
+    """
+
+    def __init__(self, max_per_pattern=MAX_URLS_PER_PATTERN):
+        self.queue = deque()
+        self.seen = set()  # Every canonical URL ever queued
+        self.max_per_pattern = max_per_pattern
+        self.pattern_counts = Counter()
+        self.traps = Counter()  # Reason -> URLs rejected
+
+    def __len__(self):
+        return len(self.queue)
+
+    def trap_reason(self, url):
+        """Why a URL looks like part of an infinite URL space, or None"""
+        if len(url) > MAX_URL_LENGTH:
+            return "URL too long"
+        segments = [segment for segment in urlparse(url).path.split('/') if segment]
+        if len(segments) > MAX_PATH_DEPTH:
+            return "path too deep"
+        if segments and max(Counter(segments).values()) > MAX_SEGMENT_REPEATS:
+            return "repeating path segments"
+        if self.pattern_counts[url_pattern(url)] >= self.max_per_pattern:
+            return "too many URLs with the same pattern"
+        return None
+
+    def add(self, url, trusted=False):
+        """
+        Queue a URL unless it was already seen or looks like a crawler trap.
+        Trusted URLs (the start page, sitemap entries) bypass trap detection.
+        Returns True if the URL was queued.
+        """
+        url = canonicalize_url(url)
+        if url in self.seen:
+            return False
+
+        if not trusted:
+            reason = self.trap_reason(url)
+            if reason:
+                self.traps[reason] += 1
+                return False
+            self.pattern_counts[url_pattern(url)] += 1
+
+        self.seen.add(url)
+        self.queue.append(url)
+        return True
+
+    def pop(self):
+        return self.queue.popleft()
+
+    def to_state(self, in_flight=()):
+        """JSON-serializable state for a checkpoint; in-flight URLs go back to the front"""
+        return {
+            'queue': list(in_flight) + list(self.queue),
+            'seen': list(self.seen),
+            'pattern_counts': dict(self.pattern_counts),
+            'traps': dict(self.traps)
+        }
+
+    def restore(self, state, done_urls=()):
+        """Continue from a checkpoint, skipping URLs that were fetched after it was taken"""
+        done_urls = set(done_urls)
+        self.queue = deque(url for url in state.get('queue', []) if url not in done_urls)
+        self.seen = set(state.get('seen', [])) | done_urls
+        self.pattern_counts = Counter(state.get('pattern_counts', {}))
+        self.traps = Counter(state.get('traps', {}))
+
+    def print_summary(self):
+        if self.traps:
+            print(f"🪤 Skipped {sum(self.traps.values())} likely crawler-trap URLs:")
+            for reason, count in self.traps.most_common():
+                print(f"   - {reason}: {count}")
+
+
+def parse_lastmod(value):
+    """Convert a sitemap <lastmod> (W3C datetime) to a Unix timestamp, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local_name(tag):
+    """Strip the XML namespace - sitemaps in the wild use several"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_sitemap(content):
+    """
+    Parse a sitemap or sitemap index.
+    Returns (child_sitemap_urls, [(url, lastmod, priority), ...]).
+    """
+    if content[:2] == b'\x1f\x8b':  # sitemap.xml.gz
+        content = gzip.decompress(content)
+
+    root = ET.fromstring(content)
+    child_sitemaps = []
+    entries = []
+
+    for element in root:
+        fields = {_local_name(child.tag): (child.text or '').strip() for child in element}
+        loc = fields.get('loc')
+        if not loc:
+            continue
+
+        if _local_name(element.tag) == 'sitemap':
+            child_sitemaps.append(loc)
+        elif _local_name(element.tag) == 'url':
+            try:
+                priority = float(fields.get('priority', 0.5))
+            except ValueError:
+                priority = 0.5
+            entries.append((loc, parse_lastmod(fields.get('lastmod')), priority))
+
+    return child_sitemaps, entries
+
+
+def discover_sitemap_urls(fetcher, base_url, max_sitemaps=MAX_SITEMAPS):
+    """
+    Seed the crawl from robots.txt and sitemap.xml.
+    Returns {url: lastmod timestamp or None} for same-host URLs, highest priority first.
+    """
+    policy = fetcher.policy_for(base_url)
+    pending = list(policy.sitemaps) or [urljoin(base_url, '/sitemap.xml')]
+    seen_sitemaps = set()
+    entries = []
+    base_netloc = urlparse(base_url).netloc
+
+    print(f"🗺️ Reading sitemaps for {base_netloc}...")
+
+    # Read one level of sitemap indexes at a time, fetching each level concurrently
+    while pending and len(seen_sitemaps) < max_sitemaps:
+        batch = [url for url in pending if url not in seen_sitemaps][:max_sitemaps - len(seen_sitemaps)]
+        seen_sitemaps.update(batch)
+        pending = []
+
+        # Collect the level, then parse in listing order so the URL order is deterministic
+        fetched = {url: (result, error) for url, result, error in fetcher.fetch_many(batch)}
+        for sitemap_url in batch:
+            result, error = fetched[sitemap_url]
+            if error is not None:
+                print(f"   ⚠️ Could not read sitemap {sitemap_url}: {error}")
+                continue
+            try:
+                child_sitemaps, sitemap_entries = parse_sitemap(result.content)
+            except (ET.ParseError, OSError, EOFError) as e:
+                print(f"   ⚠️ Invalid sitemap {sitemap_url}: {e}")
+                continue
+
+            print(f"   🗺️ {sitemap_url}: {len(sitemap_entries)} pages, {len(child_sitemaps)} nested sitemaps")
+            pending.extend(child_sitemaps)
+            entries.extend(sitemap_entries)
+
+    # Highest priority first; sort is stable so sitemap order breaks ties
+    entries.sort(key=lambda entry: -entry[2])
+
+    urls = {}
+    for url, lastmod, _ in entries:
+        if urlparse(url).netloc == base_netloc:
+            urls.setdefault(canonicalize_url(url), lastmod)
+
+    with_lastmod = sum(1 for lastmod in urls.values() if lastmod is not None)
+    print(f"✅ Sitemaps listed {len(urls)} pages ({with_lastmod} with lastmod)")
+    return urls
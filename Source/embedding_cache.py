@@ -0,0 +1,150 @@
+"""
+Persistent, content-addressed embedding cache for ingestion.
+
+Vectors are stored in SQLite keyed by the embedding model name plus a hash
+of the chunk text, so a chunk that was embedded on any previous run (or
+appears on several pages) is only ever paid for once.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = ".embedding_cache.sqlite"  # Relative to the working directory, like index.faiss
+EMBEDDING_CACHE_MAX_ENTRIES = 50000  # ~300MB of 1,536-dimension vectors; least recently used are evicted
+
+
+def cache_key(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+def pack_vector(vector):
+    return array('f', vector).tobytes()
+
+
+def unpack_vector(blob):
+    vector = array('f')
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model and consults the SQLite cache before calling it
+    """
+
+    def __init__(self, embeddings, model_name, cache_path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def _lookup(self, keys):
+        """Fetch cached vectors for the given keys and mark them as used"""
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update((key, unpack_vector(blob)) for key, blob in rows)
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(key, self.model_name, pack_vector(vector), now) for key, vector in items]
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        """Embed texts, calling the model only for text not already cached"""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # Identical texts in one batch are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self._store(fresh.items())
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def evict(self, max_entries=None):
+        """Drop least recently used vectors beyond the size bound"""
+        max_entries = self.max_entries if max_entries is None else max_entries
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excess = count - max_entries
+            if excess <= 0:
+                return 0
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+            self._conn.commit()
+        return excess
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def print_summary(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        print(f"\n🗃️ Embedding Cache Summary:")
+        print(f"   ✅ Cache hits: {self.hits}")
+        print(f"   🧠 Cache misses (embedded via API): {self.misses}")
+        print(f"   📊 Hit rate: {self.hit_rate():.1%}")
+        print(f"   💾 Cached vectors: {entries:,} (limit: {self.max_entries:,})")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,135 @@
+"""
+Adaptive concurrency for embedding API calls.
+
+Instead of sleeping a fixed time after every batch, several batches are
+sent at once and the number in flight adapts to the API: it grows by one
+after a run of successful calls and halves when the API answers 429, and
+every caller waits for as long as the rate-limit headers ask. Throughput
+settles just below the account's actual limit.
+"""
+import re
+import threading
+import time
+
+import openai
+
+EMBEDDING_CONCURRENCY = 4  # Most embedding requests in flight at once
+EMBEDDING_MAX_ATTEMPTS = 6  # Tries per batch before the error is raised
+EMBEDDING_MAX_BACKOFF = 60  # Seconds - cap on a single wait
+SUCCESSES_PER_INCREASE = 8  # Successful calls before one more request may be in flight
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError
+)
+
+
+def parse_duration(value):
+    """Parse rate-limit reset values such as '20ms', '1.5s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r'([\d.]+)(ms|s|m|h)', value)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def retry_delay(error, attempt):
+    """How long the API asked us to wait, falling back to exponential backoff"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+
+    if headers.get('retry-after-ms'):
+        delay = parse_duration(headers['retry-after-ms'])
+        if delay is not None:
+            return min(delay / 1000, EMBEDDING_MAX_BACKOFF)
+
+    delays = [
+        parse_duration(headers.get(name))
+        for name in ('retry-after', 'x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')
+    ]
+    delays = [delay for delay in delays if delay is not None]
+    if delays:
+        return min(max(delays), EMBEDDING_MAX_BACKOFF)
+    return min(2 ** attempt, EMBEDDING_MAX_BACKOFF)
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight,
+    plus a shared pause that every caller honours after a 429
+    """
+
+    def __init__(self, max_concurrency=EMBEDDING_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= self.limit:
+                    self._condition.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def succeeded(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= SUCCESSES_PER_INCREASE and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def throttled(self, delay):
+        """The API pushed back - fewer requests in flight, and everyone waits"""
+        with self._condition:
+            self.rate_limited += 1
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+
+def embed_with_backoff(embeddings, texts, limiter, max_attempts=EMBEDDING_MAX_ATTEMPTS):
+    """Embed one batch within the limiter, retrying rate limits and transient API errors"""
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            vectors = embeddings.embed_documents(texts)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                limiter.throttled(delay)
+                print(f"   ⏳ Rate limited - waiting {delay:.1f}s, {limiter.limit} requests in flight from now")
+            else:
+                print(f"   ⚠️ Embedding request failed ({type(e).__name__}) - retrying in {delay:.1f}s")
+                time.sleep(delay)
+            continue
+        finally:
+            limiter.release()
+
+        limiter.succeeded()
+        return vectors
@@ -0,0 +1,246 @@
+"""
+On-disk HTTP revalidation cache for the website loader.
+
+Bodies are stored together with their ETag / Last-Modified validators so
+the next crawl can send conditional requests. A 304 response reuses the
+stored body, and artifacts derived from a body (such as the text extracted
+from a PDF) are stored alongside it so they can be reused as well.
+
+Every use of an entry refreshes its modification time. prune() drops
+entries no crawl has used for HTTP_CACHE_MAX_AGE - pages and PDFs that
+disappeared from the site - and then the least recently used entries
+beyond HTTP_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+HTTP_CACHE_DIR = ".http_cache"  # Relative to the working directory, like index.faiss
+HTTP_CACHE_MAX_AGE = 30 * 24 * 3600  # Seconds an entry is kept without a crawl using it
+HTTP_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Least recently used entries beyond this are evicted
+
+
+def _write_atomic(path, data):
+    """Write a file so readers never see a partial body"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class HttpCache:
+    """
+    Stores response bodies and validators, one set of files per URL
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._stats_lock = threading.Lock()
+        self.not_modified = 0
+        self.skipped = 0
+        self.downloaded = 0
+        self.bytes_downloaded = 0
+        self.bytes_reused = 0
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{suffix}")
+
+    def lookup(self, url):
+        """Return the stored entry for a URL, or None"""
+        try:
+            with open(self._path(url, "json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, url):
+        """Request headers that let the server answer 304 Not Modified"""
+        entry = self.lookup(url)
+        if not entry or not os.path.exists(self.body_path(url)):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body_path(self, url):
+        return self._path(url, "body")
+
+    def load_body(self, url):
+        try:
+            with open(self.body_path(url), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_entry(self, url, response, size):
+        entry = {
+            'url': url,
+            'final_url': getattr(response, 'url', None) or url,  # After redirects
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'size': size,
+            'stored_at': time.time(),
+            'validated_at': time.time()
+        }
+        _write_atomic(self._path(url, "json"), json.dumps(entry).encode('utf-8'))
+
+    def store(self, url, response, content=None):
+        """Save a 200 response body and its validators"""
+        content = response.content if content is None else content
+        self.record_download(len(content))
+
+        if not response.headers.get('ETag') and not response.headers.get('Last-Modified'):
+            return  # Nothing to revalidate against next time
+
+        _write_atomic(self.body_path(url), content)
+        self._write_entry(url, response, len(content))
+
+    def store_file(self, url, response, file_path, size):
+        """
+        Save a 200 response body that was streamed to a file in the cache directory.
+        The file is moved into the cache; returns False if the response has no validators.
+        """
+        self.record_download(size)
+
+        if not response.headers.get('ETag') and not response.headers.get('Last-Modified'):
+            return False
+
+        os.replace(file_path, self.body_path(url))
+        self._write_entry(url, response, size)
+        return True
+
+    def revalidated(self, url, response, load_body=True):
+        """
+        Handle a 304 response - refresh the entry and return the stored body.
+        With load_body=False the body stays on disk (see body_path) and only its size is returned.
+        """
+        entry = self.lookup(url)
+        if load_body:
+            body = self.load_body(url)
+        elif os.path.exists(self.body_path(url)):
+            body = os.path.getsize(self.body_path(url))
+        else:
+            body = None
+        if entry is None or body is None:
+            return None, None
+
+        # Servers may send updated validators with a 304
+        entry['etag'] = response.headers.get('ETag', entry.get('etag'))
+        entry['last_modified'] = response.headers.get('Last-Modified', entry.get('last_modified'))
+        entry['validated_at'] = time.time()
+        _write_atomic(self._path(url, "json"), json.dumps(entry).encode('utf-8'))
+
+        with self._stats_lock:
+            self.not_modified += 1
+            self.bytes_reused += len(body) if load_body else body
+        return entry, body
+
+    def fresh_since(self, url, modified_at):
+        """
+        Return (entry, body) without any request if our copy was validated after
+        the page was last modified (e.g. according to a sitemap lastmod), else (None, None)
+        """
+        entry = self.lookup(url)
+        if entry is None or entry.get('validated_at', 0) < modified_at:
+            return None, None
+        body = self.load_body(url)
+        if body is None:
+            return None, None
+        self.touch(url)
+
+        with self._stats_lock:
+            self.skipped += 1
+            self.bytes_reused += len(body)
+        return entry, body
+
+    def record_download(self, size):
+        with self._stats_lock:
+            self.downloaded += 1
+            self.bytes_downloaded += size
+
+    def _validator(self, url):
+        entry = self.lookup(url)
+        if not entry:
+            return None
+        return entry.get('etag') or entry.get('last_modified')
+
+    def store_artifact(self, url, name, data):
+        """Save data derived from the current body (e.g. extracted PDF text)"""
+        validator = self._validator(url)
+        if validator is None:
+            return
+        payload = {'validator': validator, 'data': data}
+        _write_atomic(self._path(url, f"{name}.json"), json.dumps(payload).encode('utf-8'))
+
+    def load_artifact(self, url, name):
+        """Load a derived artifact if it was built from the body we still have"""
+        try:
+            with open(self._path(url, f"{name}.json"), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if payload.get('validator') != self._validator(url):
+            return None
+        return payload.get('data')
+
+    def touch(self, url):
+        """Mark an entry as used by this crawl, so prune() keeps it"""
+        try:
+            os.utime(self._path(url, "json"))
+        except OSError:
+            pass
+
+    def prune(self, max_age=HTTP_CACHE_MAX_AGE, max_bytes=HTTP_CACHE_MAX_BYTES):
+        """
+        Delete entries (body, validators and artifacts) unused for max_age seconds,
+        then least recently used entries beyond max_bytes. Returns (entries, bytes) removed.
+        """
+        files = defaultdict(list)  # URL key (or stray file name) -> its files
+        for name in os.listdir(self.cache_dir):
+            files[name.split('.', 1)[0]].append(os.path.join(self.cache_dir, name))
+
+        groups = []
+        for paths in files.values():
+            stats = []
+            for path in paths:
+                try:
+                    stats.append(os.stat(path))
+                except OSError:
+                    pass
+            if stats:
+                groups.append((max(stat.st_mtime for stat in stats), sum(stat.st_size for stat in stats), paths))
+        groups.sort(key=lambda group: group[0])  # Least recently used first
+
+        cutoff = time.time() - max_age
+        total_bytes = sum(size for _, size, _ in groups)
+        removed = removed_bytes = 0
+        for last_used, size, paths in groups:
+            if last_used >= cutoff and total_bytes <= max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total_bytes -= size
+            removed += 1
+            removed_bytes += size
+        return removed, removed_bytes
+
+    def print_summary(self):
+        print(f"\n♻️ HTTP Cache Summary:")
+        print(f"   🗺️ Unchanged per sitemap lastmod (no request): {self.skipped}")
+        print(f"   ✅ Not modified (304, body reused): {self.not_modified}")
+        print(f"   ♻️ Total not transferred: {self.bytes_reused/(1024*1024):.1f}MB")
+        print(f"   📥 Downloaded: {self.downloaded} ({self.bytes_downloaded/(1024*1024):.1f}MB)")
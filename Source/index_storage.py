@@ -0,0 +1,270 @@
+"""
+On-disk format of a saved index: a FAISS index file plus a SQLite docstore.
+
+LangChain's save_local/load_local pickle the whole docstore, and loading
+reads the complete index into the process's heap. Instead, an index
+directory holds:
+
+  index.faiss      - the FAISS index, written with faiss.write_index
+  docstore.sqlite  - one row per vector: its position in the index, chunk ID,
+                     compressed text and interned metadata
+
+The assistant opens the index memory-mapped, so its vectors are shared
+between processes through the page cache and loading takes milliseconds,
+and fetches chunk text and metadata from SQLite by position, only for the
+hits of a query. Nothing is unpickled. The loader, which updates the index,
+reads both files into memory instead.
+
+The docstore is compact. Metadata values such as source URLs, titles and
+content types repeat across thousands of chunks, so each distinct value is
+stored once in a values table and chunks refer to it by number. Chunk text
+is deflate-compressed one chunk at a time with a preset dictionary of the
+lines and words most chunks share, trained when the docstore is written,
+so even short chunks compress well while any single chunk can still be
+decoded on its own. Documents are materialized only for the hits that are
+fetched.
+
+Index directories saved before this format (index.pkl) are still read,
+with a warning, until the next build replaces them.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from urllib.request import pathname2url
+
+import faiss
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from ann_index import unwrap
+from index_versions import read_version_info
+
+FAISS_INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"  # Pickled docstore written by FAISS.save_local
+DOCSTORE_FORMAT = 2  # 1: plain text and JSON metadata per row; 2: compressed text, interned metadata
+ZDICT_SIZE = 32 * 1024  # Preset dictionary size - deflate cannot look back further
+ZDICT_SAMPLE_CHUNKS = 2000  # Chunks sampled to train the dictionary
+TEXT_COMPRESSION_LEVEL = 9
+
+
+def connect_read_only(db_path, **kwargs):
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True, **kwargs)
+
+
+def train_zdict(texts, size=ZDICT_SIZE):
+    """
+    Preset deflate dictionary from sample chunk texts: the lines and words found
+    in the most chunks, most frequent last (deflate reaches recent bytes most cheaply)
+    """
+    line_counts = Counter()
+    word_counts = Counter()
+    for text in texts:
+        line_counts.update({line.strip() for line in text.splitlines() if len(line.strip()) >= 8})
+        word_counts.update(set(re.findall(r'\w{4,}', text)))
+
+    candidates = [(count * len(line), line) for line, count in line_counts.items() if count > 1]
+    candidates += [(count * len(word), word) for word, count in word_counts.items() if count > 1]
+    pieces = []
+    total = 0
+    for _, piece in sorted(candidates, reverse=True):
+        encoded = piece.encode('utf-8') + b'\n'
+        if total + len(encoded) > size:
+            continue
+        pieces.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(pieces))
+
+
+def compress_text(text, zdict):
+    compressor = zlib.compressobj(TEXT_COMPRESSION_LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+    return compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+
+def decompress_text(blob, zdict):
+    decompressor = zlib.decompressobj(-15, zdict=zdict)
+    return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+
+def write_docstore(db_path, vectordb):
+    """One row per vector of a vector store, in index order, with interned metadata and compressed text"""
+    documents = []
+    for position, chunk_id in sorted(vectordb.index_to_docstore_id.items()):
+        doc = vectordb.docstore.search(chunk_id)
+        if isinstance(doc, Document):
+            documents.append((position, chunk_id, doc))
+
+    step = max(1, len(documents) // ZDICT_SAMPLE_CHUNKS)
+    zdict = train_zdict(doc.page_content for _, _, doc in documents[::step])
+    keys = {}
+    values = {}
+
+    def intern(table, value):
+        if value not in table:
+            table[value] = len(table)
+        return table[value]
+
+    temp_path = f"{db_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.execute("CREATE TABLE settings (name TEXT PRIMARY KEY, value)")
+        conn.execute("CREATE TABLE metadata_keys (id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        conn.execute("CREATE TABLE metadata_values (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            "CREATE TABLE chunks ("
+            " position INTEGER PRIMARY KEY,"
+            " chunk_id TEXT NOT NULL,"
+            " text BLOB NOT NULL,"
+            " metadata BLOB NOT NULL)"
+        )
+
+        def rows():
+            for position, chunk_id, doc in documents:
+                # (key id, value id) pairs; the chunk ID has its own column
+                pairs = array('I')
+                for key, value in doc.metadata.items():
+                    if key != 'chunk_id':
+                        pairs.extend((intern(keys, key), intern(values, json.dumps(value, default=str))))
+                yield position, chunk_id, compress_text(doc.page_content, zdict), pairs.tobytes()
+
+        conn.executemany("INSERT INTO chunks (position, chunk_id, text, metadata) VALUES (?, ?, ?, ?)", rows())
+        conn.executemany("INSERT INTO metadata_keys (id, name) VALUES (?, ?)", [(i, key) for key, i in keys.items()])
+        conn.executemany("INSERT INTO metadata_values (id, value) VALUES (?, ?)", [(i, value) for value, i in values.items()])
+        conn.executemany("INSERT INTO settings (name, value) VALUES (?, ?)", [('format', DOCSTORE_FORMAT), ('zdict', zdict)])
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(temp_path, db_path)
+
+
+class DocstoreReader:
+    """Decodes the rows of a docstore.sqlite (either format) into Documents"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        settings = dict(conn.execute("SELECT name, value FROM settings")) if 'settings' in tables else {}
+        self.format = settings.get('format', 1)
+        self.zdict = settings.get('zdict', b"")
+        # Distinct metadata keys and values are few; they are kept undecoded and decoded per hit
+        self.keys = [name for (name,) in conn.execute("SELECT name FROM metadata_keys ORDER BY id")] if self.format >= 2 else []
+        self.values = [value for (value,) in conn.execute("SELECT value FROM metadata_values ORDER BY id")] if self.format >= 2 else []
+
+    def document(self, chunk_id, text, metadata):
+        if self.format < 2:
+            return Document(page_content=text, metadata=json.loads(metadata))
+        pairs = array('I')
+        pairs.frombytes(metadata)
+        decoded = {self.keys[pairs[i]]: json.loads(self.values[pairs[i + 1]]) for i in range(0, len(pairs), 2)}
+        decoded['chunk_id'] = chunk_id
+        return Document(page_content=decompress_text(text, self.zdict), metadata=decoded)
+
+
+def save_index(vectordb, path):
+    """Write a vector store to an index directory"""
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(unwrap(vectordb.index), os.path.join(path, FAISS_INDEX_FILE))
+    write_docstore(os.path.join(path, DOCSTORE_FILE), vectordb)
+
+
+class SqliteDocstore(Docstore):
+    """Read-only docstore over docstore.sqlite, keyed by index position; Documents are built per hit"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = connect_read_only(db_path, check_same_thread=False)
+        self._reader = DocstoreReader(self._conn)
+        self._lock = threading.Lock()
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute("SELECT chunk_id, text, metadata FROM chunks WHERE position = ?", (int(search),)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._reader.document(*row)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PositionIds(Mapping):
+    """index_to_docstore_id for a SqliteDocstore: each position is its own docstore key"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self):
+        return self.count
+
+
+def read_index_mmap(path, index_type=None):
+    """
+    Open a FAISS index file memory-mapped and read-only. IVF maps its inverted
+    lists; flat, scalar / product quantized and HNSW indexes map their codes.
+    FAISS releases before IO_FLAG_MMAP_IFC (1.8.0 and older) map IVF lists only;
+    anything they cannot map is read into memory.
+    """
+    flags = [faiss.IO_FLAG_MMAP, getattr(faiss, 'IO_FLAG_MMAP_IFC', None)]
+    if index_type != 'ivf':
+        flags.reverse()
+    for flag in flags:
+        if flag is None:
+            continue
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue
+    return faiss.read_index(path)
+
+
+def open_index(path, embeddings):
+    """Vector store for serving: memory-mapped index, chunks fetched from SQLite per hit"""
+    db_path = os.path.join(path, DOCSTORE_FILE)
+    if not os.path.exists(db_path):
+        print(f"⚠️ {path} has no {DOCSTORE_FILE} - loading its pickled docstore (rebuild to switch formats)")
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    index_type = read_version_info(path).get('index', {}).get('type')
+    index = read_index_mmap(os.path.join(path, FAISS_INDEX_FILE), index_type)
+    return FAISS(embeddings, index, SqliteDocstore(db_path), PositionIds(index.ntotal))
+
+
+def load_index(path, embeddings):
+    """Vector store for updating: index and every chunk read into memory, keyed by chunk ID"""
+    db_path = os.path.join(path, DOCSTORE_FILE)
+    if not os.path.exists(db_path):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    index = faiss.read_index(os.path.join(path, FAISS_INDEX_FILE))
+    documents = {}
+    index_to_docstore_id = {}
+    conn = connect_read_only(db_path)
+    try:
+        reader = DocstoreReader(conn)
+        for position, chunk_id, text, metadata in conn.execute("SELECT position, chunk_id, text, metadata FROM chunks ORDER BY position"):
+            documents[chunk_id] = reader.document(chunk_id, text, metadata)
+            index_to_docstore_id[position] = chunk_id
+    finally:
+        conn.close()
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
+
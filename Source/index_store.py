@@ -0,0 +1,299 @@
+"""
+Incremental maintenance of the FAISS vector database.
+
+Every source URL gets a stable document ID and a content hash, recorded in
+a manifest next to the saved index. On a rebuild only new or changed
+sources are re-chunked and re-embedded, and the vectors of sources that
+changed or disappeared are deleted in batches before new ones are added.
+"""
+import hashlib
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from ann_index import index_kind, to_flat
+from index_storage import load_index
+
+INGEST_MANIFEST_FILE = "ingest_manifest.json"
+INDEX_WRITE_BUFFER = 4096  # Vectors accumulated before one bulk add to the index
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def document_id(source):
+    """Stable ID for everything indexed from one source URL"""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def assign_chunk_ids(source, chunks):
+    """
+    Give each chunk of a source a content-addressed ID and return the IDs.
+    A chunk keeps its ID - and its vector - for as long as its text is unchanged.
+    """
+    doc_id = document_id(source)
+    ids = []
+    for chunk in chunks:
+        chunk_id = f"{doc_id}-{content_hash(chunk.page_content)[:16]}"
+        chunk.metadata['doc_id'] = doc_id
+        chunk.metadata['chunk_id'] = chunk_id
+        ids.append(chunk_id)
+    return ids
+
+
+def load_manifest(index_path):
+    try:
+        with open(os.path.join(index_path, INGEST_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(index_path, manifest):
+    manifest['updated_at'] = time.time()
+    path = os.path.join(index_path, INGEST_MANIFEST_FILE)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def load_existing_index(index_path, embeddings_model, embedding_model_name, chunking=None, dimensions=None):
+    """
+    Load the previous index and manifest for an incremental update.
+    Returns (vectordb, manifest), or (None, None) when a full rebuild is needed.
+    """
+    manifest = load_manifest(index_path)
+    if manifest is None:
+        print(f"   ℹ️ No ingest manifest in {index_path} - building a new index")
+        return None, None
+
+    if manifest.get('embedding_model') != embedding_model_name:
+        print(f"   ⚠️ Index was built with {manifest.get('embedding_model')} - rebuilding with {embedding_model_name}")
+        return None, None
+
+    # Unchanged sources keep their chunks, so a different chunker needs every source re-chunked
+    if manifest.get('chunking') != chunking:
+        print(f"   ⚠️ Index was chunked with {manifest.get('chunking') or 'an older chunker'} - rebuilding with {chunking}")
+        return None, None
+
+    # Vectors of another length can't share an index; the embedding cache keeps full vectors, so this re-embeds nothing
+    if manifest.get('dimensions') != dimensions:
+        print(f"   ⚠️ Index vectors have {manifest.get('dimensions') or 'full'} dimensions - rebuilding with {dimensions or 'full'}")
+        return None, None
+
+    try:
+        vectordb = load_index(index_path, embeddings_model)
+        # Updates (deletes in particular) happen on an exact flat index; the index type is rebuilt at publish time
+        if not isinstance(vectordb.index, faiss.IndexFlatL2):
+            print(f"   🔁 Converting the {index_kind(vectordb.index).upper()} index back to flat for the update...")
+            to_flat(vectordb, index_path)
+    except Exception as e:
+        print(f"   ⚠️ Could not load existing index ({e}) - building a new index")
+        return None, None
+
+    print(f"   ✅ Loaded existing index: {vectordb.index.ntotal} vectors from {len(manifest.get('documents', {}))} sources")
+    return vectordb, manifest
+
+
+class IncrementalPlanner:
+    """
+    Decides source by source, as documents stream in, what has to be re-embedded.
+
+    Unchanged sources keep their manifest entry. A changed source hands back
+    its own previous chunk IDs; the ones its new chunks no longer produce are
+    deleted, the rest keep their vectors. finish() handles what can only be
+    known at the end: sources that disappeared from the site, chunks no
+    source refers to any more, and unchanged sources that share a
+    deduplicated chunk with a source that changed.
+    """
+
+    def __init__(self, manifest):
+        self.previous = manifest.get('documents', {}) if manifest else {}
+        self.documents = {}  # The new manifest's entries
+        self.hashes = {}
+        self.changed_sources = 0
+        self._replaced = set()  # Own chunk IDs of changed sources that the new chunks don't reproduce
+        self._released = set()  # Other sources' chunk IDs a changed source no longer relies on
+        self._borrowed = set()  # Other sources' chunk IDs a changed source now relies on
+        self._borrowers = {}  # Unchanged source relying on another source's chunk -> its documents
+
+    def check(self, source, docs):
+        """Return (changed, previous_own_chunk_ids) for all the documents of one source"""
+        digest = content_hash("\n".join(doc.page_content for doc in docs))
+        self.hashes[source] = digest
+
+        entry = self.previous.get(source)
+        own_prefix = f"{document_id(source)}-"
+        if entry and entry.get('content_hash') == digest:
+            self.documents[source] = entry
+            if any(not chunk_id.startswith(own_prefix) for chunk_id in entry.get('chunk_ids', [])):
+                self._borrowers[source] = docs
+            return False, []
+
+        self.changed_sources += 1
+        previous_ids = entry.get('chunk_ids', []) if entry else []
+        own_ids = [chunk_id for chunk_id in previous_ids if chunk_id.startswith(own_prefix)]
+        self._replaced.update(own_ids)
+        self._released.update(chunk_id for chunk_id in previous_ids if not chunk_id.startswith(own_prefix))
+        return True, own_ids
+
+    def record(self, source, chunk_ids):
+        """Chunk IDs a re-chunked source now relies on (its own and deduplicated ones)"""
+        self.documents[source] = {'content_hash': self.hashes[source], 'chunk_ids': chunk_ids}
+        # Chunks whose text survived the edit are still alive
+        self._replaced.difference_update(chunk_ids)
+        own_prefix = f"{document_id(source)}-"
+        self._borrowed.update(chunk_id for chunk_id in chunk_ids if not chunk_id.startswith(own_prefix))
+
+    def borrowed(self, chunk_ids):
+        """Those of chunk_ids that a source re-chunked in this build relies on although another source owns them"""
+        return self._borrowed.intersection(chunk_ids)
+
+    def finish(self):
+        """
+        Returns (stale_chunk_ids, sources_to_reembed) once every source has been checked.
+        sources_to_reembed is a list of (source, docs); the stale IDs must be deleted first.
+        """
+        dead = set(self._replaced)
+        candidates = set(self._released)
+        for source, entry in self.previous.items():
+            if source not in self.hashes:
+                candidates.update(entry.get('chunk_ids', []))
+
+        # An unchanged source sharing a chunk whose content was replaced has to be re-embedded
+        reembed = []
+        while True:
+            affected = [source for source in self._borrowers if dead.intersection(self.documents[source]['chunk_ids'])]
+            if not affected:
+                break
+            for source in affected:
+                chunk_ids = self.documents.pop(source)['chunk_ids']
+                own_prefix = f"{document_id(source)}-"
+                dead.update(chunk_id for chunk_id in chunk_ids if chunk_id.startswith(own_prefix))
+                candidates.update(chunk_ids)
+                reembed.append((source, self._borrowers.pop(source)))
+                self.changed_sources += 1
+
+        # Keep every chunk some source in the new manifest still refers to
+        referenced = {chunk_id for entry in self.documents.values() for chunk_id in entry['chunk_ids']}
+        return sorted((candidates | dead) - referenced), reembed
+
+    @property
+    def unchanged_sources(self):
+        return len(self.hashes) - self.changed_sources
+
+    def build_manifest(self, embedding_model_name, chunking=None, dimensions=None):
+        return {
+            'embedding_model': embedding_model_name,
+            'chunking': chunking,
+            'dimensions': dimensions,
+            'documents': self.documents
+        }
+
+
+def delete_stale_vectors(vectordb, stale_chunk_ids, present=None):
+    """
+    Remove outdated vectors in a single batch (one compaction of the index).
+    present is the set of IDs in the index, kept up to date if given.
+    """
+    if present is None:
+        present = set(vectordb.index_to_docstore_id.values())
+    ids = [chunk_id for chunk_id in stale_chunk_ids if chunk_id in present]
+    if ids:
+        vectordb.delete(ids)
+        present.difference_update(ids)
+    return len(ids)
+
+
+def create_index(embeddings_model, dimension):
+    """Empty flat L2 index, the same kind FAISS.from_embeddings builds"""
+    return FAISS(embeddings_model, faiss.IndexFlatL2(dimension), InMemoryDocstore(), {})
+
+
+def add_vectors(vectordb, vectors, chunks, chunk_ids):
+    """Add a float32 array of vectors to the index in one call, then register their chunks"""
+    vectordb.index.add(vectors)
+    vectordb.docstore.add({
+        chunk_id: Document(page_content=chunk.page_content, metadata=chunk.metadata)
+        for chunk_id, chunk in zip(chunk_ids, chunks)
+    })
+    start = len(vectordb.index_to_docstore_id)
+    vectordb.index_to_docstore_id.update((start + i, chunk_id) for i, chunk_id in enumerate(chunk_ids))
+
+
+class IndexWriter:
+    """
+    Buffers embedded chunks in a preallocated float32 array and writes them to
+    the index in bulk - one delete pass and one add per flush instead of a
+    conversion, copy and add for every embedding batch.
+
+    Chunk IDs already in the index (left behind by an interrupted run, or
+    replaced by a changed source) are deleted before the new vectors are added.
+    """
+
+    def __init__(self, vectordb, embeddings_model, capacity=INDEX_WRITE_BUFFER):
+        self.vectordb = vectordb
+        self.embeddings_model = embeddings_model
+        self.capacity = capacity
+        self.present = set(vectordb.index_to_docstore_id.values()) if vectordb is not None else set()
+        self.deleted = 0
+        self._buffer = None  # Allocated once the embedding dimension is known
+        self._chunks = []
+        self._ids = []
+        self._buffered_ids = set()
+        self._pending_deletes = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def refresh(self, chunk, chunk_id):
+        """Update the stored Document of a vector kept as-is (its metadata may have moved)"""
+        doc = self.vectordb.docstore.search(chunk_id) if self.vectordb is not None else None
+        if isinstance(doc, Document):
+            doc.metadata = chunk.metadata
+
+    def delete(self, chunk_ids):
+        """Queue IDs for deletion; they are removed before the next add"""
+        if self._buffered_ids.intersection(chunk_ids):
+            self.flush()  # Deletes apply to what was added before them
+        self._pending_deletes.update(chunk_ids)
+
+    def add(self, chunks, chunk_ids, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self._buffer is None:
+            self._buffer = np.empty((self.capacity, vectors.shape[1]), dtype=np.float32)
+
+        for i, (chunk, chunk_id) in enumerate(zip(chunks, chunk_ids)):
+            if chunk_id in self._buffered_ids or len(self._ids) == self.capacity:
+                self.flush()
+            self._buffer[len(self._ids)] = vectors[i]
+            self._chunks.append(chunk)
+            self._ids.append(chunk_id)
+            self._buffered_ids.add(chunk_id)
+
+    def flush(self):
+        """Apply pending deletes, then add every buffered vector in one call"""
+        # Vectors already in the index under a buffered ID are replaced, not duplicated
+        self._pending_deletes.update(chunk_id for chunk_id in self._ids if chunk_id in self.present)
+        if self.vectordb is not None and self._pending_deletes:
+            self.deleted += delete_stale_vectors(self.vectordb, self._pending_deletes, self.present)
+        self._pending_deletes.clear()
+
+        if not self._ids:
+            return self.vectordb
+        if self.vectordb is None:
+            self.vectordb = create_index(self.embeddings_model, self._buffer.shape[1])
+        add_vectors(self.vectordb, self._buffer[:len(self._ids)], self._chunks, self._ids)
+        self.present.update(self._ids)
+        self._chunks = []
+        self._ids = []
+        self._buffered_ids = set()
+        return self.vectordb
@@ -0,0 +1,201 @@
+"""
+Versioned, atomically published vector indexes.
+
+Every build is saved to a directory of its own under index.faiss/versions/,
+together with a version.json manifest (embedding model, dimension, chunking
+parameters, build time, vector count). The CURRENT file names the live
+version and is only replaced - atomically - once the new version is
+complete, so a reader sees either the previous index or the new one in
+full, never a half-written one.
+
+The assistant holds the loaded index in an IndexReloader, which checks
+CURRENT every so often and loads a newly published version in the
+background. Requests keep using the version they started with; the swap
+only affects requests that start after the new version is ready.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+INDEX_ROOT = "index.faiss"  # Relative to the working directory
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+VERSION_FILE = "version.json"
+LEGACY_FILES = ("index.faiss", "index.pkl", "ingest_manifest.json")  # Unversioned layout, written straight into the root
+KEEP_INDEX_VERSIONS = 3  # Published versions kept on disk, including the current one
+INDEX_POLL_INTERVAL = 30  # Seconds between the assistant's checks for a new version
+
+
+def new_version_name():
+    """Unique name for a build: build time plus a random suffix"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def version_path(root, version):
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def current_version(root):
+    """Name of the published version, or None"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def has_legacy_index(root):
+    return os.path.exists(os.path.join(root, "index.faiss")) and os.path.exists(os.path.join(root, "index.pkl"))
+
+
+def current_index_path(root=INDEX_ROOT):
+    """Directory of the live index - the published version, or an unversioned index in the root"""
+    version = current_version(root)
+    if version is not None and os.path.isdir(version_path(root, version)):
+        return version_path(root, version)
+    if has_legacy_index(root):
+        return root
+    return None
+
+
+def read_version_info(path):
+    """The version.json manifest of an index directory ({} for an unversioned index)"""
+    try:
+        with open(os.path.join(path, VERSION_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def publish_version(root, version, info, keep=KEEP_INDEX_VERSIONS):
+    """
+    Write the version's manifest, then point CURRENT at it in one atomic rename.
+    Call only after every file of the version has been written.
+    """
+    path = version_path(root, version)
+    info = dict(info, version=version, published_at=time.time())
+    with open(os.path.join(path, VERSION_FILE), 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+
+    temp_path = os.path.join(root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, os.path.join(root, CURRENT_FILE))
+
+    prune_versions(root, keep)
+    return path
+
+
+def prune_versions(root, keep=KEEP_INDEX_VERSIONS):
+    """Delete the oldest versions beyond keep, and an unversioned index superseded by them"""
+    current = current_version(root)
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    try:
+        versions = os.listdir(versions_dir)
+    except OSError:
+        return []
+    # Oldest first by publish time - names only sort to the second
+    versions.sort(key=lambda version: (read_version_info(os.path.join(versions_dir, version)).get('published_at', 0), version))
+
+    removed = []
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version == current:
+            continue
+        shutil.rmtree(os.path.join(versions_dir, version), ignore_errors=True)
+        removed.append(version)
+
+    if current is not None:
+        for name in LEGACY_FILES:
+            legacy_path = os.path.join(root, name)
+            if os.path.isfile(legacy_path):
+                os.remove(legacy_path)
+    return removed
+
+
+class IndexReloader:
+    """
+    The loaded live index, swapped for a newly published version in the background.
+
+    load(path) builds the vector store for an index directory. current() returns
+    (version, store); poll() starts loading a new version when CURRENT has changed.
+    watch() polls on a background timer, so a new version is loaded even while
+    no one is asking questions.
+    """
+
+    def __init__(self, root, load, poll_interval=INDEX_POLL_INTERVAL):
+        self.root = root
+        self.load = load
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._loading = None
+        self._last_poll = time.monotonic()
+        self._stop = threading.Event()
+        self._watcher = None
+
+        path = current_index_path(root)
+        if path is None:
+            raise FileNotFoundError(f"no vector index found in {root}")
+        self.version = current_version(root) if path != root else "unversioned"
+        self.store = load(path)
+
+    def current(self):
+        with self._lock:
+            return self.version, self.store
+
+    def poll(self):
+        """Check CURRENT (at most every poll_interval seconds); True if a new version started loading"""
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return False
+        self._last_poll = now
+        return self.check()
+
+    def check(self):
+        """Start loading the version CURRENT names if it is new; True if one started loading"""
+        version = current_version(self.root)
+        with self._lock:
+            if version is None or version in (self.version, self._loading):
+                return False
+            self._loading = version
+
+        thread = threading.Thread(target=self._load_version, args=(version,), name="index-reload", daemon=True)
+        thread.start()
+        return True
+
+    def watch(self):
+        """Poll every poll_interval seconds on a daemon thread until stop()"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="index-watch", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Could not check for a new index version: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def _load_version(self, version):
+        try:
+            store = self.load(version_path(self.root, version))
+        except Exception as e:
+            print(f"⚠️ Could not load index version {version} ({e}) - still serving {self.version}")
+            with self._lock:
+                self._loading = None
+            return
+
+        with self._lock:
+            previous = self.version
+            self.version, self.store = version, store
+            self._loading = None
+        print(f"🔄 Switched to index version {version} (was {previous})")
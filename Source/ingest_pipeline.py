@@ -0,0 +1,148 @@
+"""
+Bounded-queue plumbing for the streaming ingestion pipeline.
+
+Each stage (crawl, PDF processing, template removal, chunking, embedding)
+runs in its own thread and hands its output to the next stage through a
+bounded queue. Stages overlap - embedding starts as soon as the first
+chunks exist - and a slow stage blocks the ones feeding it, so memory use
+is capped by the queue sizes rather than by the size of the site.
+"""
+import queue
+import threading
+import traceback
+
+_END = object()  # Placed on a queue once all of its producers have finished
+
+
+class PipelineStopped(Exception):
+    """Raised in a stage when another stage failed and the pipeline is shutting down"""
+
+
+class StageQueue:
+    """
+    A bounded queue between stages that ends once every producer has closed it
+    """
+
+    def __init__(self, pipeline, maxsize, producers=1):
+        self.pipeline = pipeline
+        self._queue = queue.Queue(maxsize)
+        self._producers = producers
+        self._lock = threading.Lock()
+        self._ended = False
+
+    def put(self, item):
+        """Block while the queue is full (backpressure) unless the pipeline stops"""
+        while True:
+            if self.pipeline.stopped():
+                raise PipelineStopped()
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """Called by each producer when it has nothing more to send"""
+        with self._lock:
+            self._producers -= 1
+            last = self._producers == 0
+        if last:
+            # The end marker must not be dropped, even if the queue is full
+            while True:
+                try:
+                    self._queue.put(_END, timeout=0.1)
+                    return
+                except queue.Full:
+                    if self.pipeline.stopped():
+                        return
+
+    def get(self, timeout=None):
+        """
+        Next item, or raise queue.Empty after the timeout.
+        Returns the END marker (see ended) once all producers are done.
+        """
+        if self._ended:
+            return _END
+        waited = 0.0
+        while True:
+            if self.pipeline.stopped():
+                raise PipelineStopped()
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                waited += 0.1
+                if timeout is not None and waited >= timeout:
+                    raise
+                continue
+            if item is _END:
+                self._ended = True
+            return item
+
+    def get_nowait(self):
+        """Next item if one is waiting, else raise queue.Empty"""
+        if self._ended:
+            return _END
+        if self.pipeline.stopped():
+            raise PipelineStopped()
+        item = self._queue.get_nowait()
+        if item is _END:
+            self._ended = True
+        return item
+
+    @property
+    def ended(self):
+        return self._ended
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is _END:
+                return
+            yield item
+
+
+class Pipeline:
+    """
+    Runs stage threads and stops all of them as soon as one fails
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._threads = []
+        self.errors = []
+
+    def queue(self, maxsize, producers=1):
+        return StageQueue(self, maxsize, producers)
+
+    def stopped(self):
+        return self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+
+    def start(self, name, target, *args, outputs=()):
+        """Run target(*args) in a thread, closing its output queues when it returns"""
+        def run():
+            try:
+                target(*args)
+            except PipelineStopped:
+                pass
+            except Exception as e:
+                print(f"❌ Pipeline stage '{name}' failed: {e}")
+                traceback.print_exc()
+                self.errors.append((name, e))
+                self.stop()
+            finally:
+                for output in outputs:
+                    output.close()
+
+        thread = threading.Thread(target=run, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        if self.errors:
+            name, error = self.errors[0]
+            raise RuntimeError(f"pipeline stage '{name}' failed: {error}") from error
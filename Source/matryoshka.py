@@ -0,0 +1,88 @@
+"""
+Matryoshka truncation of embedding vectors.
+
+text-embedding-3 models are trained so that a prefix of a vector, scaled
+back to unit length, is still a good embedding of the text. Keeping the
+first EMBEDDING_DIMENSIONS dimensions (e.g. 256 or 512 of 1,536) makes the
+index proportionally smaller and search proportionally faster, for a small
+loss in recall.
+
+The same truncation has to be applied to chunk vectors at ingest and to
+question vectors at query time. Both go through TruncatedEmbeddings: the
+loader wraps its embeddings model with EMBEDDING_DIMENSIONS, the assistant
+with the dimension recorded in the index version's version.json. Vectors
+are truncated locally rather than requested shorter from the API, so the
+embedding cache keeps full vectors and changing the dimension costs no
+API calls.
+
+migrate_embedding_dimensions.py truncates an already-built index without
+re-embedding, and reports the recall each dimension keeps.
+"""
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ann_index import recall_at_k
+
+EMBEDDING_DIMENSIONS = None  # Dimensions kept per vector, e.g. 256 or 512; None keeps the model's full 1,536
+RECALL_REPORT_DIMENSIONS = (128, 256, 512, 768, 1024)  # Prefix lengths compared in the recall report
+RECALL_REPORT_QUERIES = 200  # Stored vectors used as queries in the recall report
+
+
+def truncate_vectors(vectors, dimensions):
+    """First dimensions of each vector, renormalized to unit length (float32)"""
+    vectors = np.asarray(vectors, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.ascontiguousarray(vectors / np.maximum(norms, 1e-12))
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model and truncates every vector it returns to the first
+    dimensions. Anything else (cache statistics, eviction) is passed through.
+    """
+
+    def __init__(self, embeddings, dimensions):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+    def embed_documents(self, texts):
+        return truncate_vectors(self.embeddings.embed_documents(texts), self.dimensions).tolist()
+
+    def embed_query(self, text):
+        return truncate_vectors([self.embeddings.embed_query(text)], self.dimensions)[0].tolist()
+
+
+def truncated_embeddings(embeddings, dimensions):
+    """The embeddings model, truncating to dimensions unless that is None"""
+    return embeddings if dimensions is None else TruncatedEmbeddings(embeddings, dimensions)
+
+
+def dimension_recall(vectors, dimensions_list=RECALL_REPORT_DIMENSIONS, k=8, num_queries=RECALL_REPORT_QUERIES):
+    """
+    Recall@k of exact search over truncated vectors against exact search over the
+    full ones, for each prefix length - using a sample of the stored vectors as
+    queries, each excluding itself from its results
+    """
+    vectors = truncate_vectors(vectors, vectors.shape[1])
+    rng = np.random.default_rng(0)
+    query_ids = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+    k = min(k, len(vectors) - 1)
+
+    def neighbours(candidate_vectors):
+        index = faiss.IndexFlatL2(candidate_vectors.shape[1])
+        index.add(candidate_vectors)
+        _, ids = index.search(candidate_vectors[query_ids], k + 1)
+        return [[i for i in row if i != query_id][:k] for row, query_id in zip(ids, query_ids)]
+
+    truth = neighbours(vectors)
+    recalls = {}
+    for dimensions in dimensions_list:
+        if dimensions >= vectors.shape[1]:
+            continue
+        found = neighbours(truncate_vectors(vectors, dimensions))
+        recalls[dimensions] = float(recall_at_k(found, truth))
+    return recalls
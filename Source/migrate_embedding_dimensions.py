@@ -0,0 +1,105 @@
+"""
+Truncate the published index to fewer embedding dimensions, without re-embedding.
+
+Reads the vectors of the current index version, keeps the first N
+dimensions of each (renormalized - see matryoshka.py), rebuilds the index
+with the same index type and quantization, and publishes the result as a
+new version. Chunk text, metadata and the ingest manifest are copied
+unchanged, so the next incremental build continues from it.
+
+Before migrating, it prints how much of the full-dimension search result
+each prefix length keeps (recall@8), so the dimension can be chosen from
+data rather than guessed.
+
+    python Source/migrate_embedding_dimensions.py            # recall report only
+    python Source/migrate_embedding_dimensions.py 512        # report, then migrate to 512 dimensions
+
+Set EMBEDDING_DIMENSIONS in matryoshka.py to the same value afterwards, so
+new chunks are truncated alike - otherwise the next build rebuilds at full
+length (from the embedding cache, without API calls).
+"""
+import os
+import shutil
+import sys
+import time
+
+import faiss
+
+from ann_index import build_index, bytes_per_vector, index_vectors, load_rerank_vectors, save_rerank_vectors
+from index_storage import DOCSTORE_FILE, FAISS_INDEX_FILE, LEGACY_DOCSTORE_FILE
+from index_store import load_manifest, save_manifest
+from index_versions import INDEX_ROOT, current_index_path, new_version_name, publish_version, read_version_info, version_path
+from matryoshka import RECALL_REPORT_DIMENSIONS, dimension_recall, truncate_vectors
+
+
+def load_full_vectors(path):
+    """float32 vectors of an index directory - from vectors.npy if it is quantized"""
+    vectors = load_rerank_vectors(path)
+    if vectors is not None:
+        return vectors
+    return index_vectors(faiss.read_index(os.path.join(path, FAISS_INDEX_FILE)))
+
+
+def print_recall_report(vectors, dimensions=None):
+    report_dimensions = sorted(set(RECALL_REPORT_DIMENSIONS) | ({dimensions} if dimensions else set()))
+    recalls = dimension_recall(vectors, report_dimensions)
+    print(f"\n📊 Recall@8 of truncated vs full {vectors.shape[1]}-dimension search:")
+    for prefix, recall in recalls.items():
+        marker = "  ◀" if prefix == dimensions else ""
+        print(f"   {prefix:>5} dims  {recall:6.1%}  ({prefix / vectors.shape[1]:.0%} of the size){marker}")
+    return recalls
+
+
+def migrate(root, dimensions):
+    path = current_index_path(root)
+    info = read_version_info(path)
+    vectors = load_full_vectors(path)
+    if dimensions >= vectors.shape[1]:
+        raise ValueError(f"index vectors have {vectors.shape[1]} dimensions - can only truncate to fewer")
+
+    recalls = print_recall_report(vectors, dimensions)
+
+    # Same index type and encoding as the version it replaces
+    index_info = info.get('index', {})
+    truncated = truncate_vectors(vectors, dimensions)
+    print(f"\n✂️ Truncating {len(truncated):,} vectors from {vectors.shape[1]} to {dimensions} dimensions...")
+    index, params = build_index(truncated, index_info.get('type', 'flat'), index_info.get('quantization'))
+
+    version = new_version_name()
+    version_dir = version_path(root, version)
+    os.makedirs(version_dir)
+    faiss.write_index(index, os.path.join(version_dir, FAISS_INDEX_FILE))
+    if params['quantization']:
+        save_rerank_vectors(version_dir, truncated)
+    # Vector order is unchanged, so the docstore (by position) still applies
+    for name in (DOCSTORE_FILE, LEGACY_DOCSTORE_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            shutil.copy2(os.path.join(path, name), os.path.join(version_dir, name))
+    manifest = load_manifest(path)
+    if manifest is not None:
+        manifest['dimensions'] = dimensions
+        save_manifest(version_dir, manifest)
+
+    publish_version(root, version, dict(
+        info,
+        dimension=dimensions,
+        embedding_dimensions=dimensions,
+        index=dict(params, bytes_per_vector=round(bytes_per_vector(index)), recall_at_8_vs_full_dimensions=round(recalls[dimensions], 4)),
+        migrated_from=info.get('version') or 'unversioned',
+        built_at=time.time(),
+    ))
+    print(f"📢 Published index version {version} ({dimensions} dimensions)")
+    print(f"   ℹ️ Set EMBEDDING_DIMENSIONS = {dimensions} in matryoshka.py so new chunks are truncated alike")
+    return version
+
+
+if __name__ == "__main__":
+    path = current_index_path(INDEX_ROOT)
+    if path is None:
+        print(f"❌ No index found in {INDEX_ROOT} - build one with 1_LoadWebsiteData.py first")
+        sys.exit(1)
+
+    if len(sys.argv) > 1:
+        migrate(INDEX_ROOT, int(sys.argv[1]))
+    else:
+        print_recall_report(load_full_vectors(path))
@@ -0,0 +1,172 @@
+"""
+Single-pass HTML parsing for crawled pages.
+
+Each fetched page is parsed exactly once and that parse produces everything
+the loader needs: the outgoing links for the crawl, the PDF links, and the
+LangChain Document that gets chunked and embedded.
+
+Pages are parsed with lxml when it is installed - a C parser that builds the
+tree several times faster than BeautifulSoup's pure-Python html.parser -
+and with BeautifulSoup otherwise. Both produce the same text, links and
+metadata.
+"""
+import re
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+from langchain.schema import Document
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+PDF_URL_PATTERN = re.compile(r'https?://[^\s<>"]+\.pdf', re.IGNORECASE)
+HTML_PARSER = "lxml" if lxml is not None else "html.parser"  # Parser used for crawled pages
+NON_TEXT_TAGS = ('script', 'style', 'template')  # BeautifulSoup's get_text() leaves these out
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+
+def heading_entry(tag_name, text):
+    """[level, text] for a heading, or None if it has no text"""
+    text = re.sub(r'\s+', ' ', text).strip()
+    return [int(tag_name[1]), text] if text else None
+
+
+class ParsedPage:
+    """
+    Everything extracted from one fetched page
+    """
+
+    def __init__(self, url, links, pdf_links, document):
+        self.url = url
+        self.links = links  # Absolute URLs of every <a href> on the page
+        self.pdf_links = pdf_links  # PDF URLs found in anchors or page text
+        self.document = document  # Page text with WebBaseLoader's metadata, plus the page's headings
+
+
+def build_metadata(soup, url):
+    """Page metadata in the same shape as WebBaseLoader"""
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if html_tag := soup.find("html"):
+        metadata["language"] = html_tag.get("lang", "No language found.")
+    # Heading hierarchy for the structure-aware chunker
+    metadata["headings"] = [entry for entry in (heading_entry(tag.name, tag.get_text()) for tag in soup.find_all(HEADING_TAGS)) if entry]
+    return metadata
+
+
+def find_text_pdf_links(text, url, base_url):
+    """PDF URLs written out in the page text, on the same site"""
+    # Most pages mention no PDF at all - skip the regex scan for those
+    if '.pdf' not in text.lower():
+        return set()
+    base_netloc = urlparse(base_url).netloc
+    pdf_links = set()
+    for pdf_url in PDF_URL_PATTERN.findall(text):
+        full_pdf_url = urljoin(url, pdf_url)
+        if urlparse(full_pdf_url).netloc == base_netloc:
+            pdf_links.add(full_pdf_url)
+    return pdf_links
+
+
+def decode_html(content):
+    """Decode page bytes the way BeautifulSoup would for a well-labelled page"""
+    if isinstance(content, str):
+        return content
+    encoding = EncodingDetector.find_declared_encoding(content, is_html=True) or 'utf-8'
+    try:
+        return content.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return content.decode('windows-1252', errors='replace')
+
+
+def parse_page_lxml(url, content, base_url, link_base=None):
+    """lxml path - one C-level parse, then targeted lookups on the tree"""
+    link_base = link_base or url
+    try:
+        tree = lxml.html.document_fromstring(decode_html(content))
+    except ValueError:
+        # Strings that still carry an XML encoding declaration must be parsed as bytes
+        tree = lxml.html.document_fromstring(content)
+
+    links = []
+    pdf_links = set()
+    for anchor in tree.iter('a'):
+        href = anchor.get('href')
+        if href is None:
+            continue
+        full_url = urljoin(link_base, href)
+        links.append(full_url)
+        if full_url.lower().endswith('.pdf'):
+            pdf_links.add(full_url)
+
+    metadata = {"source": url}
+    title = tree.find('.//title')
+    if title is not None:
+        metadata["title"] = title.text_content()
+    description = tree.find('.//meta[@name="description"]')
+    if description is not None:
+        metadata["description"] = description.get("content", "No description found.")
+    metadata["language"] = tree.get("lang", "No language found.")
+    # Heading hierarchy for the structure-aware chunker
+    metadata["headings"] = [entry for entry in (heading_entry(el.tag, el.text_content()) for el in tree.iter(*HEADING_TAGS)) if entry]
+
+    # Headings on lines of their own, so the chunker can find them in the text
+    for heading in tree.iter(*HEADING_TAGS):
+        heading.text = "\n" + (heading.text or "")
+        heading.tail = "\n" + (heading.tail or "")
+
+    # Drop what get_text() would skip, keeping the text that follows each element
+    etree.strip_elements(tree, *NON_TEXT_TAGS, with_tail=False)
+    text_content = "".join(tree.itertext())
+
+    pdf_links.update(find_text_pdf_links(text_content, link_base, base_url))
+    document = Document(page_content=text_content, metadata=metadata)
+    return ParsedPage(url, links, sorted(pdf_links), document)
+
+
+def parse_page_soup(url, content, base_url, link_base=None):
+    """BeautifulSoup path - used when lxml is not installed"""
+    link_base = link_base or url
+    soup = BeautifulSoup(content, 'html.parser')
+
+    links = []
+    pdf_links = set()
+
+    for link in soup.find_all('a', href=True):
+        full_url = urljoin(link_base, link['href'])
+        links.append(full_url)
+
+        # Check if it's a PDF link
+        if full_url.lower().endswith('.pdf'):
+            pdf_links.add(full_url)
+
+    # Headings on lines of their own, so the chunker can find them in the text
+    for heading in soup.find_all(HEADING_TAGS):
+        heading.insert_before("\n")
+        heading.insert_after("\n")
+
+    text_content = soup.get_text()
+
+    # Also search for PDF links in text content
+    pdf_links.update(find_text_pdf_links(text_content, link_base, base_url))
+
+    document = Document(page_content=text_content, metadata=build_metadata(soup, url))
+    return ParsedPage(url, links, sorted(pdf_links), document)
+
+
+def parse_page(url, content, base_url, parser=HTML_PARSER, link_base=None):
+    """
+    Parse a page once and return its links, PDF links and Document.
+    Relative links resolve against link_base - the URL the page was actually
+    served from, after redirects - which defaults to url.
+    """
+    if parser == "lxml":
+        return parse_page_lxml(url, content, base_url, link_base)
+    return parse_page_soup(url, content, base_url, link_base)
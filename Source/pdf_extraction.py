@@ -0,0 +1,264 @@
+"""
+PDF text extraction in worker processes.
+
+Parsing PDFs is CPU-bound, so extraction runs in a pool of worker processes
+that is fed by the (I/O-bound) downloads as they finish. Each PDF gets its
+own worker process so a pathological file can be killed when it stops
+making progress without taking the rest of the pool down with it.
+
+Workers stream text back one page at a time, so a worker holds only the
+current page. The loader collects a PDF's pages until the PDF is finished
+(its content hash and cached text cover the whole file), so its memory is
+bounded per PDF - by PDF_SIZE_LIMIT - not per page.
+
+The text extraction library is pluggable (PDF_EXTRACTOR): PyPDF2, pypdf,
+PyMuPDF or pdfminer.six. benchmark_pdf_extractors.py compares their speed,
+memory and text yield on a corpus of PDFs.
+"""
+import importlib.util
+import mmap
+import os
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+import PyPDF2
+
+PDF_EXTRACTION_WORKERS = os.cpu_count() or 2  # Parallel extraction processes
+PDF_PAGE_TIMEOUT = 60  # Seconds a worker may spend on one page before the PDF is abandoned
+PDF_EXTRACTOR = "pypdf2"  # Text extraction backend, one of PDF_EXTRACTORS
+
+
+def form_field_text(page):
+    """'Field: value' lines for the filled-in form fields on a PyPDF2 / pypdf page"""
+    lines = []
+    annotations = page.get('/Annots')
+    # /Annots may be an indirect reference to the array rather than the array itself
+    annotations = annotations.get_object() if annotations is not None else []
+    for annotation in annotations or []:
+        field = annotation.get_object()
+        if field.get('/Subtype') != '/Widget':
+            continue
+        parent = field.get('/Parent')
+        parent = parent.get_object() if parent is not None else {}
+        name = field.get('/T') or parent.get('/T')
+        value = field.get('/V') or parent.get('/V')
+        # Checkbox and radio states are names like /Yes or /Off, not text
+        if value is None or str(value).startswith('/') or not str(value).strip():
+            continue
+        lines.append(f"{name}: {value}" if name else str(value))
+    return "\n".join(lines)
+
+
+def _iter_pypdf_pages(reader_class, pdf_path):
+    """Pages via PyPDF2 or its maintained successor pypdf, which share an API"""
+    with open(pdf_path, 'rb') as pdf_file, mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as pdf_map:
+        pdf_reader = reader_class(pdf_map)
+        total_pages = len(pdf_reader.pages)
+
+        for page_number, page in enumerate(pdf_reader.pages, 1):
+            try:
+                text, error = page.extract_text(), None
+            except Exception as e:
+                text, error = None, str(e)
+            # Forms keep their answers in field widgets, not in the page content
+            try:
+                fields = form_field_text(page)
+            except Exception:
+                fields = ""  # Malformed form fields must not cost the page its text
+            if fields:
+                text = f"{text}\n{fields}" if text and text.strip() else fields
+            yield page_number, total_pages, text, error
+
+
+def iter_pages_pypdf2(pdf_path):
+    return _iter_pypdf_pages(PyPDF2.PdfReader, pdf_path)
+
+
+def iter_pages_pypdf(pdf_path):
+    import pypdf
+    return _iter_pypdf_pages(pypdf.PdfReader, pdf_path)
+
+
+def iter_pages_pymupdf(pdf_path):
+    """Pages via PyMuPDF (MuPDF's C parser), including form field values"""
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as pdf:
+        total_pages = pdf.page_count
+        for page_number, page in enumerate(pdf, 1):
+            try:
+                text, error = page.get_text(), None
+            except Exception as e:
+                text, error = None, str(e)
+            try:
+                # Values already drawn on the page by the field's appearance aren't repeated
+                fields = [
+                    f"{widget.field_name}: {widget.field_value}"
+                    for widget in page.widgets()
+                    if isinstance(widget.field_value, str) and widget.field_value.strip()
+                    and widget.field_value not in ('Off', 'Yes') and widget.field_value not in (text or "")
+                ]
+            except Exception:
+                fields = []  # Malformed form fields must not cost the page its text
+            if fields:
+                text = "\n".join([text] + fields) if text and text.strip() else "\n".join(fields)
+            yield page_number, total_pages, text, error
+
+
+def iter_pages_pdfminer(pdf_path):
+    """Pages via pdfminer.six layout analysis - slow, but keeps reading order in multi-column layouts"""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(pdf_path, 'rb') as pdf_file:
+        total_pages = resolve1(PDFDocument(PDFParser(pdf_file)).catalog['Pages'])['Count']
+        pdf_file.seek(0)
+
+        page_number = 0
+        try:
+            for page_number, layout in enumerate(extract_pages(pdf_file), 1):
+                text = "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+                yield page_number, total_pages, text, None
+        except Exception as e:
+            # pdfminer parses pages lazily, so a broken page ends the document
+            yield page_number + 1, total_pages, None, str(e)
+
+
+# Backend name -> (page iterator, module it needs)
+PDF_EXTRACTORS = {
+    'pypdf2': (iter_pages_pypdf2, 'PyPDF2'),
+    'pypdf': (iter_pages_pypdf, 'pypdf'),
+    'pymupdf': (iter_pages_pymupdf, 'pymupdf'),
+    'pdfminer': (iter_pages_pdfminer, 'pdfminer'),
+}
+
+
+def available_extractors():
+    """Backends whose library is installed"""
+    return [name for name, (_, module) in PDF_EXTRACTORS.items() if importlib.util.find_spec(module) is not None]
+
+
+def iter_pdf_pages(pdf_path, extractor=PDF_EXTRACTOR):
+    """
+    Yield (page_number, total_pages, text, error) for each page of a downloaded PDF.
+    Only the current page's text is held in memory.
+    """
+    if extractor not in PDF_EXTRACTORS:
+        raise ValueError(f"unknown PDF extractor '{extractor}' - choose one of {', '.join(PDF_EXTRACTORS)}")
+    iter_pages, _ = PDF_EXTRACTORS[extractor]
+    return iter_pages(pdf_path)
+
+
+def _extraction_worker(conn, pdf_path, extractor):
+    """Process entry point - stream each page's text back to the parent"""
+    try:
+        for page_number, total_pages, text, error in iter_pdf_pages(pdf_path, extractor):
+            if error is not None:
+                conn.send(('page_error', (page_number, error)))
+            elif text and text.strip():  # Only send non-empty pages
+                conn.send(('page', (page_number, total_pages, text)))
+            else:
+                conn.send(('progress', page_number))
+        conn.send(('done', None))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class PdfExtractionPool:
+    """
+    Bounded pool of extraction processes with a per-page timeout.
+
+    Jobs are submitted with a key as their PDFs finish downloading. poll()
+    starts queued jobs as workers free up and returns (key, kind, payload)
+    events in the order each worker produced them:
+      'page'       - (page_number, total_pages, text)
+      'page_error' - (page_number, error message)
+      'done'       - None, the PDF is finished
+      'error'      - error message, the PDF failed or timed out
+    """
+
+    def __init__(self, max_workers=PDF_EXTRACTION_WORKERS, page_timeout=PDF_PAGE_TIMEOUT, extractor=PDF_EXTRACTOR):
+        if extractor not in PDF_EXTRACTORS:
+            raise ValueError(f"unknown PDF extractor '{extractor}' - choose one of {', '.join(PDF_EXTRACTORS)}")
+        self.max_workers = max_workers
+        self.page_timeout = page_timeout
+        self.extractor = extractor
+        self._context = multiprocessing.get_context()
+        self._queued = []
+        self._running = {}  # conn -> [key, process, last_progress]
+
+    def submit(self, key, pdf_path):
+        self._queued.append((key, pdf_path))
+        self._start_queued()
+
+    def pending(self):
+        return len(self._queued) + len(self._running)
+
+    def _start_queued(self):
+        while self._queued and len(self._running) < self.max_workers:
+            key, pdf_path = self._queued.pop(0)
+            parent_conn, child_conn = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=_extraction_worker,
+                args=(child_conn, pdf_path, self.extractor),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()  # Only the worker writes to this end
+            self._running[parent_conn] = [key, process, time.monotonic()]
+
+    def _finish(self, conn):
+        key, process, _ = self._running.pop(conn)
+        conn.close()
+        process.join()
+        return key
+
+    def poll(self, timeout=0.1):
+        """Collect page events from workers, kill stalled ones, then start queued jobs"""
+        events = []
+
+        if self._running:
+            for conn in wait(list(self._running), timeout=timeout):
+                job = self._running[conn]
+                job[2] = time.monotonic()
+
+                # Drain what this worker has sent so far; the pipe applies backpressure
+                while True:
+                    try:
+                        kind, payload = conn.recv()
+                    except EOFError:
+                        kind, payload = 'error', f"worker exited with code {job[1].exitcode}"
+
+                    if kind == 'progress':
+                        pass
+                    elif kind in ('done', 'error'):
+                        events.append((self._finish(conn), kind, payload))
+                        break
+                    else:
+                        events.append((job[0], kind, payload))
+
+                    if not conn.poll():
+                        break
+
+            now = time.monotonic()
+            for conn, (key, process, last_progress) in list(self._running.items()):
+                if now - last_progress > self.page_timeout:
+                    process.terminate()
+                    self._finish(conn)
+                    events.append((key, 'error', f"no progress for {self.page_timeout}s - extraction abandoned"))
+
+        self._start_queued()
+        return events
+
+    def close(self):
+        """Kill any workers still running"""
+        for conn, (_, process, _) in list(self._running.items()):
+            process.terminate()
+            self._finish(conn)
+        self._queued.clear()
@@ -0,0 +1,183 @@
+"""
+Checkpoints for resumable ingestion runs.
+
+A run writes its progress to a local run directory as it goes: the crawl
+frontier and the pages fetched so far, and a snapshot of the index (with
+the manifest entries of the sources it fully contains) after committed
+embedding batches. If the run crashes, starting it again with the same
+settings resumes the crawl where it stopped and skips every source that
+was already committed. The run directory is removed once the index has
+been saved.
+"""
+import json
+import os
+import shutil
+import time
+
+from langchain.schema import Document
+
+from index_storage import load_index, save_index
+from page_parser import ParsedPage
+
+INGEST_RUN_DIR = ".ingest_run"  # Relative to the working directory, like index.faiss
+CRAWL_CHECKPOINT_EVERY = 20  # Pages fetched between frontier checkpoints
+EMBED_CHECKPOINT_EVERY = 10  # Embedding batches between index snapshots
+
+RUN_STATE_FILE = "run.json"
+FRONTIER_FILE = "frontier.json"
+PAGES_FILE = "pages.jsonl"
+INDEX_SNAPSHOT_DIR = "index"
+COMMITTED_FILE = "committed.json"
+
+
+def _write_json_atomic(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def document_to_dict(doc):
+    return {'page_content': doc.page_content, 'metadata': doc.metadata}
+
+
+def document_from_dict(data):
+    return Document(page_content=data['page_content'], metadata=data['metadata'])
+
+
+def _read_jsonl(path):
+    """Read a JSON-lines file, ignoring a final line cut off by a crash"""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+    except OSError:
+        pass
+    return records
+
+
+class RunCheckpoint:
+    """
+    Progress of one ingestion run, persisted in the run directory.
+
+    The run key identifies the settings the run was started with; a leftover
+    run directory from different settings is discarded rather than resumed.
+    """
+
+    def __init__(self, run_key, run_dir=INGEST_RUN_DIR, resume=True):
+        self.run_dir = run_dir
+        self.run_key = run_key
+        self.state = None
+        self._pages_file = None
+
+        existing = self._load_state()
+        if resume and existing and existing.get('run_key') == run_key:
+            self.state = existing
+            print(f"⏯️ Resuming interrupted run from {run_dir} ({existing.get('committed_batches', 0)} embedding batches committed)")
+        else:
+            if existing:
+                print(f"🧹 Discarding checkpoint of a previous run in {run_dir}")
+            shutil.rmtree(run_dir, ignore_errors=True)
+            os.makedirs(run_dir, exist_ok=True)
+            self.state = {'run_key': run_key, 'started_at': time.time(), 'committed_batches': 0, 'snapshot': False}
+            self._save_state()
+
+    def _path(self, name):
+        return os.path.join(self.run_dir, name)
+
+    def _load_state(self):
+        try:
+            with open(self._path(RUN_STATE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self):
+        self.state['updated_at'] = time.time()
+        _write_json_atomic(self._path(RUN_STATE_FILE), self.state)
+
+    # Crawl stage
+
+    def load_crawl(self):
+        """Return (frontier_state, pages) saved by an interrupted crawl, or (None, [])"""
+        try:
+            with open(self._path(FRONTIER_FILE), 'r', encoding='utf-8') as f:
+                frontier_state = json.load(f)
+        except (OSError, ValueError):
+            frontier_state = None
+
+        pages = [
+            ParsedPage(record['url'], record['links'], record['pdf_links'], document_from_dict(record['document']))
+            for record in _read_jsonl(self._path(PAGES_FILE))
+        ]
+        return frontier_state, pages
+
+    def record_page(self, page):
+        """Append a fetched page; flushed immediately so a crash loses at most this page"""
+        if self._pages_file is None:
+            self._pages_file = open(self._path(PAGES_FILE), 'a', encoding='utf-8')
+        record = {
+            'url': page.url,
+            'links': page.links,
+            'pdf_links': page.pdf_links,
+            'document': document_to_dict(page.document)
+        }
+        self._pages_file.write(json.dumps(record) + "\n")
+        self._pages_file.flush()
+
+    def save_frontier(self, frontier_state):
+        _write_json_atomic(self._path(FRONTIER_FILE), frontier_state)
+
+    def close_pages(self):
+        if self._pages_file is not None:
+            self._pages_file.close()
+            self._pages_file = None
+
+    # Index stage
+
+    @property
+    def committed_batches(self):
+        return self.state.get('committed_batches', 0)
+
+    def save_index_snapshot(self, vectordb, committed_documents, committed_batches):
+        """
+        Persist the index after the given number of embedding batches, together
+        with the manifest entries of the sources whose chunks are all in it.
+        """
+        snapshot_path = self._path(INDEX_SNAPSHOT_DIR)
+        temp_path = f"{snapshot_path}.tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        save_index(vectordb, temp_path)
+        _write_json_atomic(os.path.join(temp_path, COMMITTED_FILE), committed_documents)
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        os.replace(temp_path, snapshot_path)
+
+        self.state['committed_batches'] = committed_batches
+        self.state['snapshot'] = True
+        self._save_state()
+
+    def load_index_snapshot(self, embeddings_model):
+        """Return (vectordb, committed manifest entries) from the last snapshot, or (None, {})"""
+        if not self.state.get('snapshot'):
+            return None, {}
+        snapshot_path = self._path(INDEX_SNAPSHOT_DIR)
+        try:
+            vectordb = load_index(snapshot_path, embeddings_model)
+            with open(os.path.join(snapshot_path, COMMITTED_FILE), 'r', encoding='utf-8') as f:
+                committed = json.load(f)
+        except Exception as e:
+            print(f"   ⚠️ Could not load index snapshot ({e}) - restarting embedding")
+            self.state['committed_batches'] = 0
+            self.state['snapshot'] = False
+            self._save_state()
+            return None, {}
+        return vectordb, committed
+
+    def finish(self):
+        """The index is saved - the checkpoint is no longer needed"""
+        self.close_pages()
+        shutil.rmtree(self.run_dir, ignore_errors=True)
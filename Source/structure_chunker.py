@@ -0,0 +1,193 @@
+"""
+Structure-aware chunking for web pages and PDF pages.
+
+Instead of cutting text every N characters with an overlap, chunks follow
+the document's own structure: web pages are split into sections at their
+HTML headings (h1-h6), PDF pages into paragraphs, and whole sections,
+paragraphs and lines are grouped into chunks of about a token target. A
+chunk only breaks inside a paragraph when that paragraph alone exceeds the
+limit. Each chunk carries its heading path ('section_path') and exact token
+count in its metadata. Nothing is repeated between chunks, so chunks are
+fewer and each one stands on its own.
+
+Within a section, chunk boundaries are content-defined: a chunk ends after
+a line or paragraph whose hash falls below a threshold (once the chunk has
+reached the minimum size), not after a fixed amount of text. Inserting or
+removing a sentence therefore only changes the chunk it lands in - the
+boundaries after it stay where they were, so the later chunks keep the
+same text, the same ID and the same vector on the next incremental build.
+"""
+import hashlib
+import re
+
+from langchain.schema import Document
+
+CHUNK_TARGET_TOKENS = 350  # Average chunk size the content-defined boundaries aim for
+CHUNK_MAX_TOKENS = 500  # Hard limit - longer paragraphs are split at sentence boundaries
+CHUNK_MIN_TOKENS = 100  # No boundary before this size; smaller chunks may continue into the next section
+TOKENIZER_MODEL = "text-embedding-3-small"
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _load_encoding():
+    """tiktoken's encoding for the embedding model, loaded once - or None without tiktoken"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception as e:
+            print(f"   ⚠️ tiktoken unavailable ({type(e).__name__}) - estimating tokens from word counts")
+    return _encoding
+
+
+def tokenizer_name():
+    """Which token counter count_tokens uses - chunk boundaries depend on it"""
+    encoding = _load_encoding()
+    return f"tiktoken-{encoding.name}" if encoding is not None else "words-1.3"
+
+
+def count_tokens(text):
+    """Tokens as the embedding model counts them, or a word-based estimate without tiktoken"""
+    encoding = _load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(text.split()) * 1.3)  # ~1.3 tokens per word
+
+
+def normalize_heading(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def split_sections(text, headings):
+    """
+    Split page text into (section_path, [lines]) at the lines that are HTML headings.
+    headings is the page's [level, text] list recorded by the page parser.
+    """
+    levels = {}
+    for level, heading in headings or []:
+        levels.setdefault(normalize_heading(heading), level)
+
+    sections = []
+    path = []  # (level, heading text) from the outermost heading in
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        level = levels.get(normalize_heading(line))
+        if level is not None:
+            if lines:
+                sections.append(([heading for _, heading in path], lines))
+            path = [entry for entry in path if entry[0] < level] + [(level, line)]
+            lines = []
+        lines.append(line)
+    if lines:
+        sections.append(([heading for _, heading in path], lines))
+    return sections
+
+
+def split_paragraphs(text):
+    """Paragraphs of PDF page text - blank-line separated blocks, or lines if there are none"""
+    paragraphs = [re.sub(r'[ \t]*\n[ \t]*', '\n', block).strip() for block in re.split(r'\n\s*\n', text)]
+    paragraphs = [paragraph for paragraph in paragraphs if paragraph]
+    if len(paragraphs) <= 1:
+        paragraphs = [line.strip() for line in text.splitlines() if line.strip()]
+    return paragraphs
+
+
+def is_boundary(unit, tokens, target_tokens, min_tokens):
+    """
+    Content-defined cut point: true for a unit whose hash falls below a threshold
+    proportional to its length, so boundaries fall on average every
+    (target_tokens - min_tokens) tokens past the minimum, and always after the same units
+    """
+    digest = hashlib.blake2b(normalize_heading(unit).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2**64 < tokens / max(1, target_tokens - min_tokens)
+
+
+def split_oversized(unit, max_tokens):
+    """Break one paragraph that exceeds max_tokens at sentence, then word, boundaries"""
+    pieces = []
+    for sentence in SENTENCE_END.split(unit):
+        if count_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        words = sentence.split()
+        step = max(1, int(max_tokens / 1.5))  # Words rarely exceed 1.5 tokens
+        pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+    return pieces
+
+
+class StructureChunker:
+    """
+    Groups the units of each section (lines of a web page, paragraphs of a PDF page)
+    into chunks at content-defined boundaries - about target_tokens on average,
+    at least min_tokens unless the section is shorter, never more than max_tokens
+    """
+
+    def __init__(self, target_tokens=CHUNK_TARGET_TOKENS, max_tokens=CHUNK_MAX_TOKENS, min_tokens=CHUNK_MIN_TOKENS):
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+
+    @property
+    def signature(self):
+        """Identifies the chunking settings and token counter in the ingest manifest"""
+        return f"structure-cdc-{self.target_tokens}/{self.max_tokens}/{self.min_tokens}/{tokenizer_name()}"
+
+    def sections(self, document):
+        """(section_path, [units]) for a document, by its type"""
+        metadata = document.metadata
+        if metadata.get('type') == 'pdf':
+            return [([f"Page {metadata.get('page', '?')}"], split_paragraphs(document.page_content))]
+        return split_sections(document.page_content, metadata.get('headings'))
+
+    def split_document(self, document):
+        """Split one Document into chunk Documents with section_path and tokens metadata"""
+        metadata = {key: value for key, value in document.metadata.items() if key != 'headings'}
+        chunks = []
+        current, current_tokens, current_path = [], 0, None
+
+        def emit():
+            text = "\n".join(current)
+            chunk_metadata = dict(metadata, section_path=" > ".join(current_path), tokens=count_tokens(text))
+            chunks.append(Document(page_content=text, metadata=chunk_metadata))
+
+        for path, units in self.sections(document):
+            # A small chunk may run on into the next section of the same top-level section
+            if current and (current_tokens >= self.min_tokens or path[:1] != current_path[:1]) and current_path:
+                emit()
+                current, current_tokens = [], 0
+            if not current or not current_path:
+                current_path = path  # Text before the first heading belongs with the first section
+
+            for unit in units:
+                tokens = count_tokens(unit)
+                pieces = [(unit, tokens)] if tokens <= self.max_tokens else [
+                    (piece, count_tokens(piece)) for piece in split_oversized(unit, self.max_tokens)
+                ]
+                for i, (piece, piece_tokens) in enumerate(pieces):
+                    if current and current_tokens + piece_tokens > self.max_tokens:
+                        emit()
+                        current, current_tokens, current_path = [], 0, path
+                    if current and i > 0:
+                        # Sentences of a split paragraph stay on one line
+                        current[-1] = f"{current[-1]} {piece}"
+                        current_tokens += piece_tokens
+                    else:
+                        current.append(piece)
+                        current_tokens += piece_tokens + 1  # The joining newline
+
+                    if current_tokens >= self.min_tokens and is_boundary(piece, piece_tokens, self.target_tokens, self.min_tokens):
+                        emit()
+                        current, current_tokens, current_path = [], 0, path
+
+        if current:
+            emit()
+        return chunks
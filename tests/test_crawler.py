@@ -0,0 +1,110 @@
+from crawler import MAX_URLS_PER_PATTERN, CrawlFrontier, canonicalize_url, url_pattern
+from page_parser import parse_page
+
+EDLIO_PAGE = "https://www.example.org/apps/pages/index.jsp?uREC_ID={}&type=d&pREC_ID={}"
+
+
+def test_edlio_pages_are_not_treated_as_a_trap():
+    frontier = CrawlFrontier()
+    urls = [EDLIO_PAGE.format(100 + i, 2000 + i) for i in range(300)]
+
+    assert all(frontier.add(url) for url in urls)
+    assert len(frontier) == len(urls)
+    assert not frontier.traps
+
+
+def test_edlio_pages_have_distinct_patterns():
+    assert url_pattern(canonicalize_url(EDLIO_PAGE.format(1, 2))) != url_pattern(canonicalize_url(EDLIO_PAGE.format(3, 4)))
+
+
+def test_calendar_paging_is_still_capped():
+    frontier = CrawlFrontier()
+    for day in range(MAX_URLS_PER_PATTERN + 50):
+        frontier.add(f"https://www.example.org/apps/events/?id=7&date={day}&view=month")
+
+    assert len(frontier) == MAX_URLS_PER_PATTERN
+    assert frontier.traps["too many URLs with the same pattern"] == 50
+
+
+def test_canonical_url_keeps_trailing_slash():
+    assert canonicalize_url("HTTPS://Ex.org//athletics/#top") == "https://ex.org/athletics/"
+
+
+def test_relative_links_resolve_against_the_served_url():
+    html = b'<html><body><a href="schedule.html">Schedule</a><a href="forms/permit.pdf">Permit</a></body></html>'
+
+    page = parse_page(canonicalize_url("https://ex.org/athletics/"), html, "https://ex.org/")
+    assert page.links == ["https://ex.org/athletics/schedule.html", "https://ex.org/athletics/forms/permit.pdf"]
+
+    # Fetched as /athletics and redirected to /athletics/
+    page = parse_page("https://ex.org/athletics", html, "https://ex.org/", link_base="https://ex.org/athletics/")
+    assert page.links[0] == "https://ex.org/athletics/schedule.html"
+    assert page.pdf_links == ["https://ex.org/athletics/forms/permit.pdf"]
+    assert page.document.metadata["source"] == "https://ex.org/athletics"
+
+
+def serve(responses):
+    """Local server answering GETs with (status, headers) from responses in turn; returns (base URL, request times)"""
+    import http.server
+    import threading
+    import time
+
+    times = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/robots.txt":
+                self.send_response(404)
+                self.end_headers()
+                return
+            times.append(time.monotonic())
+            status, headers = responses[min(len(times), len(responses)) - 1]
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", times, server
+
+
+def test_429_is_retried_after_retry_after_through_the_rate_limiter():
+    from crawler import PoliteFetcher
+
+    base, times, server = serve([(429, {"Retry-After": "1"}), (200, {})])
+    try:
+        response = PoliteFetcher(default_delay=0.05).get(f"{base}/page")
+    finally:
+        server.shutdown()
+
+    assert response.status_code == 200
+    assert len(times) == 2
+    assert times[1] - times[0] >= 0.95
+
+
+def test_rate_limit_retries_are_bounded():
+    from crawler import RATE_LIMIT_RETRIES, PoliteFetcher
+
+    base, times, server = serve([(503, {"Retry-After": "0"})])
+    try:
+        response = PoliteFetcher(default_delay=0.01).get(f"{base}/page")
+    finally:
+        server.shutdown()
+
+    assert response.status_code == 503
+    assert len(times) == RATE_LIMIT_RETRIES + 1
+
+
+def test_retry_after_http_date():
+    from email.utils import formatdate
+    import time
+    from crawler import retry_after_seconds
+
+    assert retry_after_seconds("30") == 30
+    assert 50 < retry_after_seconds(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert retry_after_seconds("soon") is None
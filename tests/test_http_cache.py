@@ -0,0 +1,56 @@
+import os
+import time
+
+from http_cache import HttpCache
+
+
+class Response:
+    def __init__(self, url, content):
+        self.url = url
+        self.content = content
+        self.headers = {'ETag': '"v1"', 'Content-Type': 'text/html'}
+
+
+def store(cache, url, content=b"<html>page</html>", age=0):
+    cache.store(url, Response(url, content))
+    cache.store_artifact(url, "pages", ["text"])
+    if age:
+        then = time.time() - age
+        for name in os.listdir(cache.cache_dir):
+            os.utime(os.path.join(cache.cache_dir, name), (then, then))
+
+
+def test_prune_drops_entries_unused_for_max_age(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    store(cache, "https://ex.org/gone", age=40 * 24 * 3600)
+    store(cache, "https://ex.org/kept")
+
+    removed, _ = cache.prune(max_age=30 * 24 * 3600)
+
+    assert removed == 1
+    assert cache.lookup("https://ex.org/gone") is None
+    assert cache.load_artifact("https://ex.org/gone", "pages") is None
+    assert cache.load_body("https://ex.org/kept") == b"<html>page</html>"
+    assert len(os.listdir(tmp_path)) == 3  # The kept entry's body, validators and artifact
+
+
+def test_used_entries_survive_max_age(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    store(cache, "https://ex.org/page", age=40 * 24 * 3600)
+
+    entry, body = cache.fresh_since("https://ex.org/page", 0)
+
+    assert body is not None
+    assert cache.prune(max_age=30 * 24 * 3600) == (0, 0)
+
+
+def test_prune_evicts_least_recently_used_beyond_max_bytes(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    store(cache, "https://ex.org/old", b"x" * 1000, age=3600)
+    store(cache, "https://ex.org/new", b"y" * 1000)
+
+    removed, removed_bytes = cache.prune(max_bytes=1500)
+
+    assert removed == 1 and removed_bytes > 1000
+    assert cache.lookup("https://ex.org/old") is None
+    assert cache.lookup("https://ex.org/new") is not None
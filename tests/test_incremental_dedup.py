@@ -0,0 +1,102 @@
+import importlib.util
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+from chunk_dedup import ChunkDeduplicator
+from index_store import IncrementalPlanner
+from structure_chunker import StructureChunker
+
+NOTICE = ("All students must bring a signed permission slip and a packed lunch on the day of the field trip. "
+          "Buses leave the front circle at eight o'clock sharp and return by three in the afternoon.")
+
+
+@pytest.fixture(scope="module")
+def loader():
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Source", "1_LoadWebsiteData.py")
+    spec = importlib.util.spec_from_file_location("load_website_data", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ListQueue(list):
+    def put(self, item):
+        self.append(item)
+
+
+def page(url, text):
+    return url, [Document(page_content=text, metadata={'source': url, 'headings': []})]
+
+
+def build(loader, sources, previous=None):
+    """One incremental build of the chunk stage; returns (chunk stage output, manifest, indexed chunks)"""
+    manifest, indexed = previous or (None, {})
+    planner = IncrementalPlanner(manifest)
+    deduplicator = ChunkDeduplicator()
+    if manifest:
+        ids = list(indexed)
+        vectordb = SimpleNamespace(index_to_docstore_id=dict(enumerate(ids)), docstore=InMemoryDocstore(indexed))
+        loader.seed_deduplicator(deduplicator, vectordb, manifest)
+
+    output = ListQueue()
+    loader.chunk_stage(sources, output, StructureChunker(), planner, deduplicator, Counter())
+
+    indexed = dict(indexed)
+    for item in output:
+        if item[0] == 'chunk':
+            indexed[item[2]] = item[1]
+        elif item[0] == 'delete':
+            for chunk_id in item[1]:
+                indexed.pop(chunk_id, None)
+    return output, planner.build_manifest("test-model"), indexed
+
+
+def embedded(output):
+    return [item[1].page_content for item in output if item[0] == 'chunk']
+
+
+def test_new_source_repeating_an_indexed_chunk_is_not_embedded_again(loader):
+    first = [page("https://ex.org/trip", NOTICE)]
+    output, manifest, indexed = build(loader, first)
+    assert embedded(output) == [NOTICE]
+    [notice_id] = manifest['documents']["https://ex.org/trip"]['chunk_ids']
+
+    # Next build: the page is unchanged, and a new page repeats its notice
+    second = first + [page("https://ex.org/news", NOTICE)]
+    output, manifest, indexed = build(loader, second, (manifest, indexed))
+
+    assert embedded(output) == []
+    assert manifest['documents']["https://ex.org/news"]['chunk_ids'] == [notice_id]
+    assert list(indexed) == [notice_id]
+    assert indexed[notice_id].metadata['sources'] == ["https://ex.org/trip", "https://ex.org/news"]
+
+
+def test_borrowed_chunk_survives_its_owner_changing(loader):
+    first = [page("https://ex.org/trip", NOTICE)]
+    output, manifest, indexed = build(loader, first)
+    [notice_id] = manifest['documents']["https://ex.org/trip"]['chunk_ids']
+
+    # The copy is seen first; then the original page is rewritten
+    second = [page("https://ex.org/news", NOTICE), page("https://ex.org/trip", "The field trip has been cancelled.")]
+    output, manifest, indexed = build(loader, second, (manifest, indexed))
+
+    assert embedded(output) == ["The field trip has been cancelled."]
+    assert manifest['documents']["https://ex.org/news"]['chunk_ids'] == [notice_id]
+    assert notice_id in indexed
+
+
+def test_edited_source_is_not_matched_against_its_old_text(loader):
+    first = [page("https://ex.org/trip", NOTICE)]
+    output, manifest, indexed = build(loader, first)
+
+    edited = NOTICE.replace("eight", "nine")
+    output, manifest, indexed = build(loader, [page("https://ex.org/trip", edited)], (manifest, indexed))
+
+    assert embedded(output) == [edited]
+    assert [chunk.page_content for chunk in indexed.values()] == [edited]
@@ -0,0 +1,41 @@
+import faiss
+import numpy as np
+import pytest
+
+from ann_index import build_index
+from index_storage import read_index_mmap
+
+
+def write_index(tmp_path, index_type):
+    vectors = np.random.default_rng(0).normal(size=(2000, 16)).astype(np.float32)
+    index, _ = build_index(vectors, index_type, None)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+    return path, vectors
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_read_index_mmap_without_mmap_ifc_flag(tmp_path, monkeypatch, index_type):
+    # faiss-cpu 1.8.0 has no IO_FLAG_MMAP_IFC
+    path, vectors = write_index(tmp_path, index_type)
+    monkeypatch.delattr(faiss, "IO_FLAG_MMAP_IFC", raising=False)
+
+    index = read_index_mmap(path, index_type)
+
+    assert index.ntotal == len(vectors)
+    _, ids = index.search(vectors[:5], 1)
+    assert list(ids[:, 0]) == [0, 1, 2, 3, 4]
+
+
+def test_read_index_mmap_falls_back_to_reading_into_memory(tmp_path, monkeypatch):
+    path, vectors = write_index(tmp_path, "flat")
+    read_index = faiss.read_index
+
+    def read_without_mmap(index_path, flags=0):
+        if flags:
+            raise RuntimeError("cannot map this index")
+        return read_index(index_path)
+
+    monkeypatch.setattr(faiss, "read_index", read_without_mmap)
+
+    assert read_index_mmap(path, "flat").ntotal == len(vectors)
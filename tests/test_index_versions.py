@@ -0,0 +1,28 @@
+import os
+import time
+
+from index_versions import IndexReloader, new_version_name, publish_version, version_path
+
+
+def publish(root):
+    version = new_version_name()
+    os.makedirs(version_path(root, version))
+    publish_version(root, version, {})
+    return version
+
+
+def test_watch_swaps_in_new_version_without_polling(tmp_path):
+    root = str(tmp_path)
+    first = publish(root)
+    reloader = IndexReloader(root, lambda path: path, poll_interval=0.05)
+    reloader.watch()
+    try:
+        second = publish(root)
+        deadline = time.monotonic() + 5
+        while reloader.current()[0] != second and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        reloader.stop()
+
+    assert first != second
+    assert reloader.current() == (second, version_path(root, second))
@@ -0,0 +1,51 @@
+from pdf_extraction import iter_pdf_pages
+
+
+def write_pdf(path, objects):
+    """A PDF from numbered object bodies, with a valid cross-reference table"""
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(data)
+    return str(path)
+
+
+def form_pdf(path, annots):
+    content = b"BT /F1 12 Tf 72 720 Td (Permission slip) Tj ET"
+    return write_pdf(path, [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> /Annots " + annots + b" >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"[8 0 R]",
+        b"<< /Type /Annot /Subtype /Link /Rect [0 0 1 1] >>",
+        b"<< /Type /Annot /Subtype /Widget /FT /Tx /T (Student) /V (Alice Smith) /Rect [72 600 300 620] >>",
+    ])
+
+
+def test_indirect_annots_keep_page_text_and_fields(tmp_path):
+    pdf_path = form_pdf(tmp_path / "form.pdf", b"6 0 R")
+
+    [(page_number, total_pages, text, error)] = list(iter_pdf_pages(pdf_path, "pypdf2"))
+
+    assert error is None
+    assert "Permission slip" in text
+    assert "Student: Alice Smith" in text
+
+
+def test_broken_form_fields_do_not_lose_page_text(tmp_path):
+    # /Annots pointing at something that is not an array of annotations
+    pdf_path = form_pdf(tmp_path / "broken.pdf", b"5 0 R")
+
+    [(page_number, total_pages, text, error)] = list(iter_pdf_pages(pdf_path, "pypdf2"))
+
+    assert error is None
+    assert "Permission slip" in text
@@ -0,0 +1,17 @@
+import structure_chunker
+from structure_chunker import StructureChunker
+
+
+def test_signature_names_the_token_counter(monkeypatch):
+    chunker = StructureChunker()
+
+    monkeypatch.setattr(structure_chunker, "_encoding", None)
+    monkeypatch.setattr(structure_chunker, "_encoding_loaded", True)
+    estimated = chunker.signature
+
+    class Encoding:
+        name = "cl100k_base"
+
+    monkeypatch.setattr(structure_chunker, "_encoding", Encoding())
+    assert estimated.endswith("/words-1.3")
+    assert chunker.signature.endswith("/tiktoken-cl100k_base")